@@ -22,10 +22,16 @@
 #
 #
 
+from array import array
+import itertools
+import re
+import sys
+
+import numpy as np
+
 DEBUG = False
 
 if DEBUG:
-    import sys
 
     def eprint(*args, **kwargs):
         print(*args, file=sys.stderr, **kwargs)
@@ -36,10 +42,18 @@ else:
         pass
 
 
-MULTILINE_ERROR = ValueError(
-    "';' found. Only one object can be convert. \
- Please split before convert."
-)
+MULTILINE_ERROR = ValueError("';' found. Only one object can be convert. \
+ Please split before convert.")
+
+
+# a record ends with a not escaped ';' followed by a newline
+RECORD_END = re.compile(r"(?<!\\);[ \t]*\r?\n")
+
+# characters read at once by PdFile.stream
+STREAM_CHUNK = 1 << 16
+
+# values by '#A' record when writing an array, as Pd does
+ARRAY_CHUNK = 1000
 
 
 def unescape(source: str) -> str:
@@ -56,6 +70,10 @@ def escape(source: str) -> str:
     return unescape(source).replace(" ", r"\ ")
 
 
+# side of the cells of the Patch spatial index
+GRID_CELL = 64
+
+
 # helpers for sorting
 def byX(o):
     return o.x
@@ -75,12 +93,17 @@ class FileLine:
     acts as string or int depend on context
     """
 
+    __slots__ = ("lineNumber", "string")
+
     def __init__(self, numberedLine: tuple[int, str]):
         self.lineNumber = numberedLine[0]
         self.string = numberedLine[1]
 
-        self.__len__ = self.string.__len__
-        self.__getitem__ = self.string.__getitem__
+    def __len__(self):
+        return len(self.string)
+
+    def __getitem__(self, key):
+        return self.string[key]
 
     def __str__(self):
         return self.string
@@ -121,7 +144,8 @@ class FileLine:
         return getattr(self.string, attr)
 
     def checkAndSplit(self):
-        if self.endswith(";"):
+        # keep an escaped ending semicolon
+        if self.string.endswith(";") and not self.string.endswith("\\;"):
             self.string = self.string[:-1]
         return self.string.split()
 
@@ -131,6 +155,8 @@ class Definition:
     Represents a PD 'box'
     """
 
+    __slots__ = ("index", "x", "y", "type")
+
     def __init__(self, x: int, y: int, index: int = -1, type: str = "nothing"):
         self.index = index
         self.x = int(x)
@@ -166,6 +192,8 @@ class Object(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r36
     """
 
+    __slots__ = ("args",)
+
     def __init__(self, x: int, y: int, type: str, index=-1, args=""):
         super().__init__(x, y, index, type)
         if not isinstance(args, list):
@@ -184,8 +212,13 @@ class Object(Definition):
         if words[1] != "obj":
             raise ValueError("This is not an object definition.")
 
+        # types and arguments repeat a lot across patches, share their strings
         return Object(
-            words[2], words[3], words[4], int(code), [unescape(s) for s in words[5:]]
+            words[2],
+            words[3],
+            sys.intern(words[4]),
+            int(code),
+            [sys.intern(unescape(s)) for s in words[5:]],
         )
 
 
@@ -195,6 +228,18 @@ class Coords:
     see https://puredata.info/docs/developer/PdFileFormat#r33
     """
 
+    __slots__ = (
+        "xFrom",
+        "yTo",
+        "xTo",
+        "yFrom",
+        "width",
+        "height",
+        "gop",
+        "left",
+        "top",
+    )
+
     def __init__(self, xFrom, yTo, xTo, yFrom, width, height, gop, left=0, top=0):
         self.xFrom = xFrom
         self.yTo = yTo
@@ -227,6 +272,8 @@ class Message(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r35
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, x: int, y: int, index: int = -1, value: str = "empty"):
         super().__init__(x, y, index, "msg")
         self.value = value
@@ -249,6 +296,8 @@ class Text(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r3B
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, x: int, y: int, index: int = -1, value: str = "empty"):
         super().__init__(x, y, index, "text")
         self.value = value
@@ -270,6 +319,8 @@ class Struct:
     a PureData structure definition
     """
 
+    __slots__ = ("index", "name", "args")
+
     def __init__(self, index: int, name: str, args: str):
         self.index = index
         self.name = name
@@ -293,6 +344,8 @@ class Connect:
     see https://puredata.info/docs/developer/PdFileFormat#r32
     """
 
+    __slots__ = ("index", "firstObject", "outlet", "secondObject", "inlet")
+
     def __init__(self, index: int, obj1: int, outlet: int, obj2: int, inlet: int):
         self.index = index
         self.firstObject = obj1
@@ -312,6 +365,113 @@ class Connect:
         return Connect(int(code), words[2], words[3], words[4], words[5])
 
 
+class ConnectTable:
+    """
+    the wires of a patch in a flat array of
+    (source, outlet, sink, inlet) rows, with their line numbers
+    indexing and iterating yield Connect copies, edit the wires
+    with add, set and remove
+    """
+
+    __slots__ = ("table", "lineNumbers")
+
+    WIDTH = 4
+    SOURCE, OUTLET, SINK, INLET = range(WIDTH)
+
+    def __init__(self, connects=()):
+        self.table = array("i")
+        self.lineNumbers = array("i")
+        for connect in connects:
+            self.append(connect)
+
+    def __len__(self):
+        return len(self.lineNumbers)
+
+    def __getitem__(self, i):
+        """a copy of the wire i, changing it does not change the table"""
+        i = self.checkIndex(i)
+        row = self.table[i * self.WIDTH : (i + 1) * self.WIDTH]
+        return Connect(self.lineNumbers[i], *row)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def checkIndex(self, i: int) -> int:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("connect index out of range")
+        return i
+
+    def set(self, i: int, obj1: int, outlet: int, obj2: int, inlet: int):
+        """replace the wire i, its line number is kept"""
+        i = self.checkIndex(i)
+        start = i * self.WIDTH
+        self.table[start : start + self.WIDTH] = array(
+            "i", (int(obj1), int(outlet), int(obj2), int(inlet))
+        )
+
+    def remove(self, i: int):
+        """remove the wire i"""
+        i = self.checkIndex(i)
+        del self.table[i * self.WIDTH : (i + 1) * self.WIDTH]
+        del self.lineNumbers[i]
+
+    def add(self, obj1: int, outlet: int, obj2: int, inlet: int, lineNumber=-1):
+        self.table.extend((int(obj1), int(outlet), int(obj2), int(inlet)))
+        self.lineNumbers.append(lineNumber)
+        return self[-1]
+
+    def append(self, connect: Connect):
+        self.table.extend(
+            (
+                int(connect.firstObject),
+                int(connect.outlet),
+                int(connect.secondObject),
+                int(connect.inlet),
+            )
+        )
+        self.lineNumbers.append(int(connect.index))
+
+    def addLine(self, code: FileLine):
+        """parse a '#X connect' line without building a Connect"""
+        words = code.checkAndSplit()
+        if words[1] != "connect":
+            raise ValueError("This is not a connect definition.")
+        self.table.extend((int(words[2]), int(words[3]), int(words[4]), int(words[5])))
+        self.lineNumbers.append(int(code))
+
+    def nextIndex(self) -> int:
+        return max(self.lineNumbers) + 1 if self.lineNumbers else 0
+
+    def columns(self) -> np.ndarray:
+        """a (n, 4) copy of the table"""
+        return np.array(self.table, dtype=np.intc).reshape(-1, self.WIDTH)
+
+    def fanOut(self, count: int = 0) -> np.ndarray:
+        """number of wires leaving each object"""
+        return np.bincount(self.columns()[:, self.SOURCE], minlength=count)
+
+    def fanIn(self, count: int = 0) -> np.ndarray:
+        """number of wires entering each object"""
+        return np.bincount(self.columns()[:, self.SINK], minlength=count)
+
+    def outgoing(self, index: int) -> np.ndarray:
+        """(source, outlet, sink, inlet) rows leaving an object"""
+        cols = self.columns()
+        return cols[cols[:, self.SOURCE] == index]
+
+    def incoming(self, index: int) -> np.ndarray:
+        """(source, outlet, sink, inlet) rows entering an object"""
+        cols = self.columns()
+        return cols[cols[:, self.SINK] == index]
+
+
+def gridCell(obj) -> tuple[int, int]:
+    return (obj.x // GRID_CELL, obj.y // GRID_CELL)
+
+
 class Patch:
     """
     a PureData patch
@@ -321,6 +481,8 @@ class Patch:
         self, definitions, connects, structs, coords, canvas, subPatches, arrays
     ):
         self.definitions = definitions
+        if not isinstance(connects, ConnectTable):
+            connects = ConnectTable(connects)
         self.connects = connects
         self.structs = structs
         self.coords = coords
@@ -335,15 +497,55 @@ class Patch:
         #  as puredata doesn't refer to linenumber but definition order
         for i, obj in enumerate(sorted(self.definitions + self.subPatches, key=byLine)):
             obj.index = i
-
-    def __str__(self):
-        contents = (
-            [self.canvas]
-            + self.structs
-            + sorted(self.definitions + self.subPatches, key=byLine)
-            + self.connects
+        self.invalidate()
+
+    ## lazy indexes
+    #  built on first query, then kept up to date by addDef/connect
+    #  call invalidate() after editing definitions or connects directly
+    def invalidate(self):
+        self._byType = None
+        self._edges = None
+        self._grid = None
+
+    def typeIndex(self) -> dict:
+        """type -> definitions, in definition order"""
+        if self._byType is None:
+            self._byType = {}
+            for obj in self.definitions:
+                self._byType.setdefault(obj.type, []).append(obj)
+        return self._byType
+
+    def edgeIndex(self) -> tuple[dict, dict]:
+        """(object index -> outgoing Connect, object index -> incoming Connect)"""
+        if self._edges is None:
+            outgoing = {}
+            incoming = {}
+            for connect in self.connects:
+                outgoing.setdefault(connect.firstObject, []).append(connect)
+                incoming.setdefault(connect.secondObject, []).append(connect)
+            self._edges = (outgoing, incoming)
+        return self._edges
+
+    def gridIndex(self) -> dict:
+        """(x // GRID_CELL, y // GRID_CELL) -> definitions"""
+        if self._grid is None:
+            self._grid = {}
+            for obj in self.definitions:
+                self._grid.setdefault(gridCell(obj), []).append(obj)
+        return self._grid
+
+    def body(self) -> list:
+        """the patch contents without its canvas and structs lines"""
+        return (
+            sorted(self.definitions + self.subPatches, key=byLine)
+            + self.arrays
+            + list(self.connects)
             + self.coords
         )
+
+    def __str__(self):
+        # structs are declared before the canvas
+        contents = self.structs + [self.canvas] + self.body()
         return "\n".join([str(s) for s in contents])
 
     def setCoords(
@@ -361,24 +563,53 @@ class Patch:
         self.coords = [Coords(xFrom, yTo, xTo, yFrom, width, height, gop, left, top)]
 
     def getDefOfType(self, type: str) -> list[Definition]:
-        return [obj for obj in self.definitions if obj.type == type]
+        return list(self.typeIndex().get(type, ()))
+
+    def outEdges(self, obj) -> list[Connect]:
+        return list(self.edgeIndex()[0].get(int(obj), ()))
+
+    def inEdges(self, obj) -> list[Connect]:
+        return list(self.edgeIndex()[1].get(int(obj), ()))
+
+    def defsInRect(self, xMin, xMax, yMin, yMax, type: str = None) -> list[Definition]:
+        """definitions matching Definition.inRect, in definition order"""
+        grid = self.gridIndex()
+        found = []
+        for cx in range(int(xMin) // GRID_CELL, int(xMax) // GRID_CELL + 1):
+            for cy in range(int(yMin) // GRID_CELL, int(yMax) // GRID_CELL + 1):
+                for obj in grid.get((cx, cy), ()):
+                    if (type is None or obj.type == type) and obj.inRect(
+                        xMin, xMax, yMin, yMax
+                    ):
+                        found.append(obj)
+        return sorted(found, key=byLine)
 
     def addDef(self, obj: Definition) -> Definition:
         if obj.index < 0:
             obj.index = max([o.index for o in self.definitions]) + 1
         self.definitions.append(obj)
+        if self._byType is not None:
+            self._byType.setdefault(obj.type, []).append(obj)
+        if self._grid is not None:
+            self._grid.setdefault(gridCell(obj), []).append(obj)
         return obj
 
     def connect(self, obj1, outlet, obj2, inlet):
-        obj = Connect(
-            max([o.index for o in self.connects]) + 1,
-            int(obj1),
-            outlet,
-            int(obj2),
-            inlet,
+        connect = self.connects.add(
+            int(obj1), outlet, int(obj2), inlet, self.connects.nextIndex()
         )
-        self.connects.append(obj)
-        return obj
+        if self._edges is not None:
+            self._edges[0].setdefault(connect.firstObject, []).append(connect)
+            self._edges[1].setdefault(connect.secondObject, []).append(connect)
+        return connect
+
+    def fanOut(self) -> np.ndarray:
+        """number of wires leaving each object, by object index"""
+        return self.connects.fanOut(len(self.definitions) + len(self.subPatches))
+
+    def fanIn(self) -> np.ndarray:
+        """number of wires entering each object, by object index"""
+        return self.connects.fanIn(len(self.definitions) + len(self.subPatches))
 
     def chainConnect(self, objList):
         for i, obj1 in enumerate(objList[:-1]):
@@ -386,79 +617,99 @@ class Patch:
 
     @staticmethod
     def fromLines(code: list[FileLine]):
-
-        mainStructs = {l for l in code if l.startswith("#N struct")}
-
-        # Split subpatches and arrays
-        subPatchesLinesNumber = []
-        currentLevel = 0
-        arraysLinesNumber = []
-        for l in sorted(code, key=lambda l: l.lineNumber):
-            if l.startswith("#X array"):
-                arraysLinesNumber.append(int(l))
-            if l.startswith("#N canvas"):
-                subPatchesLinesNumber.append((currentLevel, int(l), len(code)))
-                currentLevel += 1
-            if l.startswith("#X restore"):
-                if currentLevel > 0:
-                    currentLevel -= 1
-                    subPatchesLinesNumber[-1] = (
-                        subPatchesLinesNumber[-1][0],
-                        subPatchesLinesNumber[-1][1],
-                        int(l) + 1,
-                    )
+        """
+        build the patch tree in one pass over the lines
+        the first '#N canvas' is the patch one, the next ones open sub-patches
+        """
+        stack = [PatchBuilder()]
+        arrayDef = None
+        for line in code:
+            string = line.string
+            builder = stack[-1]
+
+            # array datas follow the array definition
+            if string.startswith("#A"):
+                if arrayDef is None:
+                    raise ValueError(f"array datas without array : {string}")
+                arrayDef.append(line)
+                continue
+            arrayDef = None
+
+            if string.startswith("#X connect"):
+                builder.connects.addLine(line)
+            elif string.startswith("#N canvas"):
+                if builder.canvas is None:
+                    builder.canvas = line
                 else:
+                    stack.append(PatchBuilder(line))
+            elif string.startswith("#X restore"):
+                if len(stack) < 2:
                     raise ValueError("Error in subpatch definition.")
-
-        firstLine = int(code[0])
-
-        # sub-patches
-        subPatchesCode = [
-            code[start - firstLine : end - firstLine]
-            for lvl, start, end in subPatchesLinesNumber
-            if lvl == 1
-        ]
-        subPatchesLines = set(l for lines in subPatchesCode for l in lines)
-        subPatches = []
-        for lines in subPatchesCode:
-            subPatches.append(SubPatch.fromLines(lines))
-
-        # arrays
-        arraysCode = [
-            code[start - firstLine : start - firstLine + 2]
-            for start in arraysLinesNumber
-        ]
-        arraysLines = set(l for lines in arraysCode for l in lines)
-        arrays = []
-        for lines in arraysCode:
-            arrays.append(Array.fromLines(lines))
-
-        # main patch
-        main = set(code) - subPatchesLines - arraysLines
-        mainCanvas = list(sorted(main))[0]
-        mainConnects = {l for l in main if l.startswith("#X connect")}
-        mainCoords = {l for l in main if l.startswith("#X coords")}
-        mainObjects = (
-            {l for l in main if l.startswith("#X")} - mainConnects - mainCoords
-        )
-
-        canvas = mainCanvas + ";"
-        structs = [Struct.fromLine(l) for l in mainStructs]
-        definitions = [Definition.fromLine(l) for l in mainObjects]
-        connects = [Connect.fromLine(l) for l in mainConnects]
-        coords = [Coords.fromLine(l) for l in mainCoords]
-
-        return Patch(definitions, connects, structs, coords, canvas, subPatches, arrays)
+                stack.pop()
+                stack[-1].subPatches.append(
+                    SubPatch.fromParts(builder.canvas, line, builder.build())
+                )
+            elif string.startswith("#X coords"):
+                builder.coords.append(Coords.fromLine(line))
+            elif string.startswith("#X array"):
+                arrayDef = [line]
+                builder.arrays.append(arrayDef)
+            elif string.startswith("#N struct"):
+                builder.structs.append(Struct.fromLine(line))
+            elif string.startswith("#X"):
+                builder.definitions.append(Definition.fromLine(line))
+
+        if len(stack) > 1:
+            raise ValueError("Error in subpatch definition.")
+        return stack[0].build()
 
     @staticmethod
     def fromFile(filename: str):
         with open(filename, "r") as hFile:
-            contents = PdFile(hFile.read().split(";\n"))
+            lines = PdFile.stream(hFile)
+            first = next(lines, None)
+            if first is None or not PdFile.isHeader(first):
+                raise ValueError(f"{filename} is not in a valid Pure-Data format.")
 
-        if not contents.isValid():
-            raise ValueError(f"{filename} is not in a valid Pure-Data format.")
+            return Patch.fromLines(itertools.chain([first], lines))
 
-        return Patch.fromLines(sorted(contents.lines(), key=lambda l: l.lineNumber))
+
+class PatchBuilder:
+    """
+    the parts of a patch being parsed
+    """
+
+    __slots__ = (
+        "canvas",
+        "definitions",
+        "connects",
+        "structs",
+        "coords",
+        "subPatches",
+        "arrays",
+    )
+
+    def __init__(self, canvas: FileLine = None):
+        self.canvas = canvas
+        self.definitions = []
+        self.connects = ConnectTable()
+        self.structs = []
+        self.coords = []
+        self.subPatches = []
+        self.arrays = []
+
+    def build(self) -> Patch:
+        if self.canvas is None:
+            raise ValueError("Patch without canvas.")
+        return Patch(
+            self.definitions,
+            self.connects,
+            self.structs,
+            self.coords,
+            self.canvas + ";",
+            self.subPatches,
+            [Array.fromLines(lines) for lines in self.arrays],
+        )
 
 
 class SubPatch(Definition):
@@ -466,6 +717,18 @@ class SubPatch(Definition):
     a PureData sub-patch
     """
 
+    __slots__ = (
+        "width",
+        "height",
+        "winX",
+        "winY",
+        "name",
+        "args",
+        "contents",
+        "canvasName",
+        "vis",
+    )
+
     def __init__(
         self,
         x: int,
@@ -478,6 +741,8 @@ class SubPatch(Definition):
         name: str,
         args: str,
         contents: Patch,
+        canvasName: str = None,
+        vis: int = 1,
     ):
         super().__init__(x, y, index, "subpatch")
         self.width = width
@@ -487,71 +752,113 @@ class SubPatch(Definition):
         self.name = name
         self.args = args
         self.contents = contents
+        self.canvasName = canvasName or name
+        self.vis = vis
 
     def __str__(self):
-        header = f"#N canvas {self.width} {self.height} {self.winX} {self.winY} {self.name} 1;"
+        header = (
+            f"#N canvas {self.width} {self.height} {self.winX} {self.winY}"
+            f" {self.canvasName} {self.vis};"
+        )
         if self.name == "graph":
             footer = f"#X restore {self.x} {self.y} graph;"
         else:
-            footer = (
-                f"#X restore {self.x} {self.y} pd {self.name} {' '.join(self.args)};"
-            )
-        return f"{header}\n{str(self.contents)}\n{footer}"
+            args = f" {' '.join(self.args)}" if self.args else ""
+            footer = f"#X restore {self.x} {self.y} pd {self.name}{args};"
+        body = "\n".join([str(s) for s in self.contents.structs + self.contents.body()])
+        return f"{header}\n{body}\n{footer}" if body else f"{header}\n{footer}"
 
     @staticmethod
-    def fromLines(code: list[FileLine]):
-        header = code[0]
-        footer = code[-1]
-        contents = code[1:-1]
-
-        if header.endswith(";"):
-            header = header[:-1]
-        if footer.endswith(";"):
-            footer = footer[:-1]
-
-        hWords = header.split()
-        fWords = footer.split()
+    def fromParts(header: FileLine, footer: FileLine, contents: Patch):
+        hWords = header.checkAndSplit()
+        fWords = footer.checkAndSplit()
         if hWords[1] != "canvas" or fWords[1] != "restore":
             raise ValueError("This is not a subpatch definition.")
 
-        defContents = Patch.fromLines(contents)
-
+        vis = hWords[7] if len(hWords) > 7 else 1
         if len(fWords) > 5:
             return SubPatch(
                 fWords[2],
                 fWords[3],
-                int(code[0]),
+                int(header),
                 hWords[2],
                 hWords[3],
                 hWords[4],
                 hWords[5],
                 fWords[5],
                 fWords[6:],
-                defContents,
+                contents,
+                hWords[6],
+                vis,
             )
         # graph case, only 5 words
         return SubPatch(
             fWords[2],
             fWords[3],
-            int(code[0]),
+            int(header),
             hWords[2],
             hWords[3],
             hWords[4],
             hWords[5],
             "graph",
             None,
-            defContents,
+            contents,
+            hWords[6],
+            vis,
         )
 
+    @staticmethod
+    def fromLines(code: list[FileLine]):
+        # the header is the canvas of the contents
+        return SubPatch.fromParts(code[0], code[-1], Patch.fromLines(code[:-1]))
+
 
 class PdFile:
     """
     a PureData file
     """
 
+    __slots__ = ("contents",)
+
     def __init__(self, code: list[str]):
         self.contents = [FileLine(l) for l in enumerate(code)]
 
+    @staticmethod
+    def fromText(text: str):
+        """split the file text in records, escaped semicolons are kept"""
+        records = RECORD_END.split(text)
+        # the last record may end the file without newline
+        if records and records[-1].rstrip().endswith(";"):
+            records[-1] = records[-1].rstrip()[:-1]
+        return PdFile([r for r in records if r.strip()])
+
+    @staticmethod
+    def stream(hFile, chunkSize: int = STREAM_CHUNK):
+        """yield the FileLine of a text file object, reading it by chunks"""
+        number = 0
+        tail = ""
+        while True:
+            chunk = hFile.read(chunkSize)
+            if not chunk:
+                break
+            records = RECORD_END.split(tail + chunk)
+            # the last one may continue in the next chunk
+            tail = records.pop()
+            for record in records:
+                if record.strip():
+                    yield FileLine((number, record))
+                    number += 1
+        # the last record may end the file without newline
+        tail = tail.rstrip()
+        if tail.endswith(";") and not tail.endswith("\\;"):
+            tail = tail[:-1]
+        if tail.strip():
+            yield FileLine((number, tail))
+
+    @staticmethod
+    def isHeader(line) -> bool:
+        return line.startswith("#N struct ") or line.startswith("#N canvas ")
+
     def strings(self):
         return [str(l) for l in self.contents]
 
@@ -559,9 +866,7 @@ class PdFile:
         return self.contents
 
     def isValid(self):
-        return self.contents[0].startswith("#N struct ") or self.contents[0].startswith(
-            "#N canvas "
-        )
+        return PdFile.isHeader(self.contents[0])
 
     def __len__(self):
         return len(self.contents)
@@ -573,6 +878,8 @@ class FloatAtom(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r34
     """
 
+    __slots__ = ("values",)
+
     def __init__(
         self,
         x,
@@ -608,7 +915,7 @@ class FloatAtom(Definition):
         if words[1] != "floatatom":
             raise ValueError("This is not a FloatAtom definition.")
 
-        return FloatAtom(words[2], words[3], int(code), *words[4:])
+        return FloatAtom(words[2], words[3], int(code), *map(sys.intern, words[4:]))
 
 
 class SymbolAtom(Definition):
@@ -617,6 +924,8 @@ class SymbolAtom(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r3A
     """
 
+    __slots__ = ("values",)
+
     def __init__(
         self,
         x,
@@ -652,7 +961,7 @@ class SymbolAtom(Definition):
         if words[1] != "symbolatom":
             raise ValueError("This is not a SymbolAtom definition.")
 
-        return SymbolAtom(words[2], words[3], int(code), *words[4:])
+        return SymbolAtom(words[2], words[3], int(code), *map(sys.intern, words[4:]))
 
 
 class ListBox(Definition):
@@ -661,6 +970,8 @@ class ListBox(Definition):
     see https://puredata.info/docs/developer/PdFileFormat#r3A
     """
 
+    __slots__ = ("values",)
+
     def __init__(
         self,
         x,
@@ -696,46 +1007,76 @@ class ListBox(Definition):
         if words[1] != "symbolatom":
             raise ValueError("This is not a SymbolAtom definition.")
 
-        return SymbolAtom(words[2], words[3], int(code), *words[4:])
+        return SymbolAtom(words[2], words[3], int(code), *map(sys.intern, words[4:]))
 
 
 class Array:
     """
     an array
     see https://puredata.info/docs/developer/PdFileFormat#r31
+    the '#A' records are kept as text and decoded on the first datas access
     """
 
-    def __init__(self, index: int, name: str, size: int, saveFlag: int, datas: list):
+    __slots__ = ("index", "name", "size", "saveFlag", "_records", "_datas")
+
+    def __init__(self, index: int, name: str, size: int, saveFlag: int, datas=()):
         self.index = index
         self.name = name
         self.size = size
         self.saveFlag = saveFlag
-        self.datas = datas
+        self._records = None
+        self._datas = np.asarray(datas, dtype=float)
+
+    @property
+    def datas(self) -> np.ndarray:
+        """the values as float array"""
+        if self._datas is None:
+            # the values may be modified now, forget the text
+            self._datas = self.decode()
+            self._records = None
+        return self._datas
+
+    @datas.setter
+    def datas(self, values):
+        self._datas = np.asarray(values, dtype=float)
+        self._records = None
+
+    def decode(self) -> np.ndarray:
+        datas = np.zeros(int(self.size))
+        for record in self._records:
+            # #A start_index values...
+            _, start, values = (record.split(None, 2) + [""])[:3]
+            values = np.fromstring(values, sep=" ")
+            start = int(start)
+            datas[start : start + len(values)] = values
+        return datas
 
     def __str__(self):
-        lines = f"#X array {self.name} {self.size} float {self.saveFlag};\n#A" " ".join(
-            self.datas
-        )
-        return lines
+        header = f"#X array {self.name} {self.size} float {self.saveFlag};"
+        if self._records is not None:
+            # not decoded yet, as read
+            return "\n".join([header] + [f"{r};" for r in self._records])
+        if not len(self._datas):
+            return header
+        records = [
+            f"#A {i} {' '.join(f'{v:g}' for v in self._datas[i : i + ARRAY_CHUNK])};"
+            for i in range(0, len(self._datas), ARRAY_CHUNK)
+        ]
+        return "\n".join([header] + records)
 
     @staticmethod
     def fromLines(code: list[FileLine]):
         header = code[0]
-        contents = code[1:]
-
-        if header.endswith(";"):
-            header = header[:-1]
-        if contents[-1].endswith(";"):
-            contents[-1] = contents[-1][:-1]
 
-        hWords = header.split()
+        hWords = header.checkAndSplit()
         if hWords[1] != "array":
             raise ValueError("This is not an array definition.")
 
-        datas = [l for line in contents for l in str(line).split()]
-        datas.remove("#A")
-
-        return Array(int(code[0]), hWords[2], hWords[3], hWords[5], datas)
+        arrayDef = Array(int(header), hWords[2], hWords[3], hWords[5])
+        if len(code) > 1:
+            arrayDef._records = [str(line) for line in code[1:]]
+            arrayDef._datas = None
+        return arrayDef
 
 
 class Canvas(Object):
@@ -743,6 +1084,8 @@ class Canvas(Object):
     helper for canvas creation
     """
 
+    __slots__ = ()
+
     def __init__(
         self,
         x=100,
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  PdParser_benchmark.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+# parse all the shipped Pure-Data files and report the parser speed
+# with --array, parse a patch saving a large array instead
+
+from os.path import dirname, join, abspath
+import argparse
+import glob
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from PdParser import Patch
+
+PD_PATH = join(dirname(abspath(__file__)), "..", "..", "pure-data")
+
+
+def writeArrayPatch(filename, size):
+    """a patch with a graph of a saved array, as Pd writes it"""
+    rnd = random.Random(0)
+    with open(filename, "w") as hFile:
+        hFile.write("#N canvas 0 50 450 300 12;\n")
+        hFile.write("#N canvas 0 50 450 250 (subpatch) 0;\n")
+        hFile.write(f"#X array table {size} float 2;\n")
+        for start in range(0, size, 1000):
+            values = [f"{rnd.uniform(-1, 1):g}" for _ in range(min(1000, size - start))]
+            hFile.write(f"#A {start} {' '.join(values)};\n")
+        hFile.write(f"#X coords 0 1 {size} -1 200 140 1 0 0;\n")
+        hFile.write("#X restore 20 20 graph;\n")
+
+
+def arrayBenchmark(size):
+    fd, filename = tempfile.mkstemp(suffix=".pd")
+    os.close(fd)
+    try:
+        writeArrayPatch(filename, size)
+        tracemalloc.start()
+        start = time.perf_counter()
+        patch = Patch.fromFile(filename)
+        parsed = time.perf_counter() - start
+        memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        array = patch.subPatches[0].contents.arrays[0]
+        start = time.perf_counter()
+        array.datas
+        decoded = time.perf_counter() - start
+    finally:
+        os.unlink(filename)
+
+    print(
+        f"array of {size} values : parse {parsed * 1000:.1f} ms, memory {memory / 1e6:.2f} MB"
+        f" (peak {peak / 1e6:.2f} MB), first access {decoded * 1000:.1f} ms"
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PdParser")
+    parser.add_argument("--path", type=str, default=PD_PATH, help="tree to parse")
+    parser.add_argument("--repeat", type=int, default=5, help="runs count")
+    parser.add_argument("--array", type=int, default=0, help="array size to parse")
+    args = parser.parse_args()
+
+    if args.array:
+        return arrayBenchmark(args.array)
+
+    files = sorted(glob.glob(join(args.path, "**", "*.pd"), recursive=True))
+    texts = []
+    for filename in files:
+        with open(filename, "r") as hFile:
+            texts.append((filename, hFile.read()))
+
+    # parse once to sort out the unsupported files and measure the memory
+    failed = []
+    patches = []
+    tracemalloc.start()
+    for filename, _ in texts:
+        try:
+            patches.append(Patch.fromFile(filename))
+        except ValueError as e:
+            failed.append(f"{filename} : {e}")
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del patches
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for filename, _ in texts:
+            try:
+                Patch.fromFile(filename)
+            except ValueError:
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    size = sum(len(text) for _, text in texts)
+    print(f"{len(files)} files, {size / 1e6:.2f} MB, {len(failed)} not supported")
+    print(
+        f"best of {args.repeat} : {best * 1000:.1f} ms,"
+        f" {len(files) / best:.0f} files/s, {size / best / 1e6:.1f} MB/s"
+    )
+    print(
+        f"memory : {memory / 1e6:.2f} MB,"
+        f" {memory / max(1, len(files) - len(failed)) / 1e3:.1f} kB/patch"
+    )
+    for fail in failed:
+        print(f"  {fail}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  fudi-loadgen.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+
+# Drive the FCPD server without Pure-Data.
+# Speak the fc_client.pd protocol : listen the callback port, connect to
+# FreeCAD, send "initrcv port", then stream "$0 command ..." messages.
+# Each virtual patch (one $0) waits the reply before sending its next
+# message, so the concurrency is the number of virtual patches.
+# With --pipeline N, each virtual patch keeps N messages in flight, tagged
+# with the "$0 rid <id> ..." envelope that the server echoes in its replies.
+#
+# Examples :
+#   fudi-loadgen.py --mix get=4,set=2,ctrlr=3,part=1 --rate 500 --duration 10
+#   fudi-loadgen.py --mix get --concurrency 1 --pipeline 16
+#   fudi-loadgen.py --trace session.txt --timing original
+
+import argparse
+import asyncio
+import collections
+import random
+import time
+
+# first $0 of the virtual patches
+DOLLARZERO_BASE = 1000
+
+# $0 of the setup messages
+SETUP_DOLLARZERO = "999"
+
+# request id envelope, see pdserver.REQUEST_ID
+REQUEST_ID = "rid"
+
+# synthetic messages, {d} is the $0, {obj} the test object, {v} a random value
+MIX_TEMPLATES = {
+    "get": "{d} get property {obj} Length",
+    "set": "{d} set property {obj} Length {v}",
+    "ctrlr": "{d} ctrlr 0 {v} 1 {v}",
+    "part": "{d} Part makeBox {v} {v} {v}",
+}
+
+# setup messages by virtual patch
+MIX_SETUP = {
+    "ctrlr": "{d} newctrlr f f | f",
+}
+
+
+def parseMix(text):
+    """get=4,set=2 -> {"get": 4, "set": 2}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in MIX_TEMPLATES:
+            raise ValueError(f"unknown message kind {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def readTrace(filePath):
+    """return [(time_s or None, message)] from a text trace
+    one FUDI message by line, optionally preceded by a timestamp in s and a tab"""
+    trace = []
+    with open(filePath) as f:
+        for line in f:
+            line = line.strip().rstrip(";")
+            if not line:
+                continue
+            stamp = None
+            if "\t" in line:
+                head, line = line.split("\t", 1)
+                stamp = float(head)
+            # the connection messages are sent by the generator itself
+            if line.split(" ", 1)[0] in ("initrcv", "close"):
+                continue
+            trace.append((stamp, line))
+    return trace
+
+
+def percentile(samples, ratio):
+    if not samples:
+        return 0
+    return samples[min(int(ratio * len(samples)), len(samples) - 1)]
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.writer = None
+        self.callbackServer = None
+        self.callbackWriters = []
+        # $0 -> send times of the messages waiting a reply
+        self.pending = collections.defaultdict(collections.deque)
+        self.replies = {}  # $0 -> future of the next reply
+        # ($0, request id) -> [send time, future] of the tagged messages
+        self.tagged = {}
+        self.latencies = []
+        self.errors = 0
+        self.sent = 0
+        self.unexpected = 0
+
+    ## callback side
+    async def onCallback(self, reader, writer):
+        self.callbackWriters.append(writer)
+        buffer = ""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            buffer += data.decode("utf8")
+            *messages, buffer = buffer.split(";")
+            now = time.perf_counter()
+            for msg in messages:
+                self.onReply(msg.strip(), now)
+
+    def onReply(self, msg, now):
+        if not msg:
+            return
+        dollarZero, _, value = msg.partition(" ")
+        if value.startswith(f"{REQUEST_ID} "):
+            self.onTaggedReply(dollarZero, value, now)
+            return
+        if not self.pending[dollarZero]:
+            # message not sent as a reply (observers, controler outputs...)
+            self.unexpected += 1
+            return
+        self.latencies.append(now - self.pending[dollarZero].popleft())
+        if value.startswith("ERROR"):
+            self.errors += 1
+        future = self.replies.pop(dollarZero, None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def onTaggedReply(self, dollarZero, value, now):
+        _, requestId, value = (value.split(" ", 2) + [""])[:3]
+        entry = self.tagged.pop((dollarZero, requestId), None)
+        if entry is None:
+            self.unexpected += 1
+            return
+        sent, future = entry
+        self.latencies.append(now - sent)
+        if value.startswith("ERROR"):
+            self.errors += 1
+        if not future.done():
+            future.set_result(value)
+
+    ## server side
+    async def connect(self):
+        args = self.args
+        self.callbackServer = await asyncio.start_server(
+            self.onCallback, args.host, args.callback_port
+        )
+        _, self.writer = await asyncio.open_connection(args.host, args.port)
+        self.writer.write(f"initrcv {args.callback_port};\n".encode("utf8"))
+        await self.writer.drain()
+
+    def send(self, msg):
+        dollarZero = msg.split(" ", 1)[0]
+        self.pending[dollarZero].append(time.perf_counter())
+        self.writer.write(f"{msg};\n".encode("utf8"))
+        self.sent += 1
+
+    async def request(self, msg):
+        """send msg and wait its reply"""
+        dollarZero = msg.split(" ", 1)[0]
+        future = asyncio.get_running_loop().create_future()
+        self.replies[dollarZero] = future
+        self.send(msg)
+        await self.writer.drain()
+        try:
+            return await asyncio.wait_for(future, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            # forget the lost reply
+            if self.pending[dollarZero]:
+                self.pending[dollarZero].popleft()
+            return None
+
+    async def taggedRequest(self, msg, requestId):
+        """send msg with a request id and wait its reply"""
+        dollarZero, _, command = msg.partition(" ")
+        future = asyncio.get_running_loop().create_future()
+        key = (dollarZero, str(requestId))
+        self.tagged[key] = [time.perf_counter(), future]
+        self.writer.write(
+            f"{dollarZero} {REQUEST_ID} {requestId} {command};\n".encode("utf8")
+        )
+        self.sent += 1
+        await self.writer.drain()
+        try:
+            return await asyncio.wait_for(future, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            self.tagged.pop(key, None)
+            return None
+
+    ## synthetic mix
+    async def runMix(self):
+        args = self.args
+        mix = parseMix(args.mix)
+        kinds = list(mix)
+        weights = [mix[k] for k in kinds]
+
+        obj = await self.request(f"{SETUP_DOLLARZERO} Object Part Box")
+        for i in range(args.concurrency):
+            d = DOLLARZERO_BASE + i
+            for kind in kinds:
+                if kind in MIX_SETUP:
+                    await self.request(MIX_SETUP[kind].format(d=d))
+        self.latencies.clear()
+        self.sent = 0
+        self.errors = 0
+
+        # each lane of each virtual patch sends at rate / (concurrency * pipeline)
+        lanes = args.concurrency * args.pipeline
+        interval = lanes / args.rate if args.rate else 0
+        end = time.perf_counter() + args.duration
+        requestIds = collections.Counter()
+
+        async def lane(d, seed):
+            rnd = random.Random(seed)
+            nextTime = time.perf_counter()
+            while time.perf_counter() < end:
+                kind = rnd.choices(kinds, weights)[0]
+                v = f"{rnd.uniform(1, 100):.3f}"
+                msg = MIX_TEMPLATES[kind].format(d=d, obj=obj, v=v)
+                if args.pipeline > 1:
+                    requestIds[d] += 1
+                    await self.taggedRequest(msg, requestIds[d])
+                else:
+                    await self.request(msg)
+                if interval:
+                    nextTime += interval
+                    await asyncio.sleep(max(0, nextTime - time.perf_counter()))
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                lane(DOLLARZERO_BASE + i, DOLLARZERO_BASE + i + 100000 * j)
+                for i in range(args.concurrency)
+                for j in range(args.pipeline)
+            )
+        )
+        return time.perf_counter() - start
+
+    ## trace replay
+    async def runTrace(self):
+        args = self.args
+        trace = readTrace(args.trace)
+        start = time.perf_counter()
+        first = next((t for t, _ in trace if t is not None), 0)
+        for count, (stamp, msg) in enumerate(trace):
+            if args.timing == "original" and stamp is not None:
+                delay = stamp - first - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif args.rate:
+                delay = count / args.rate - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.send(msg)
+            # keep at most concurrency messages in flight
+            while sum(map(len, self.pending.values())) >= args.concurrency:
+                await self.writer.drain()
+                await asyncio.sleep(0)
+        # wait the last replies
+        deadline = time.perf_counter() + args.timeout
+        while any(self.pending.values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        self.errors += sum(map(len, self.pending.values()))
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        samples = sorted(self.latencies)
+        print(f"messages   : {self.sent} sent, {len(samples)} replies")
+        print(f"errors     : {self.errors}, unexpected messages : {self.unexpected}")
+        print(f"throughput : {len(samples) / elapsed:.0f} msg/s over {elapsed:.2f} s")
+        print(
+            "latency    : "
+            + ", ".join(
+                f"p{int(r * 100)} {percentile(samples, r) * 1000:.3f} ms"
+                for r in (0.5, 0.9, 0.99)
+            )
+            + f", max {(samples[-1] if samples else 0) * 1000:.3f} ms"
+        )
+
+    async def run(self):
+        await self.connect()
+        if self.args.trace:
+            elapsed = await self.runTrace()
+        else:
+            elapsed = await self.runMix()
+        self.report(elapsed)
+        self.writer.close()
+        for writer in self.callbackWriters:
+            writer.close()
+            await writer.wait_closed()
+        self.callbackServer.close()
+        await self.callbackServer.wait_closed()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the FCPD server without Pure-Data"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="FreeCAD address")
+    parser.add_argument("--port", type=int, default=8888, help="FreeCAD port")
+    parser.add_argument(
+        "--callback-port", type=int, default=8889, help="port to listen replies on"
+    )
+    parser.add_argument(
+        "--mix",
+        default="get=4,set=2,ctrlr=3,part=1",
+        help=f"synthetic mix of {', '.join(MIX_TEMPLATES)} with weights",
+    )
+    parser.add_argument("--trace", help="replay a text trace instead of the mix")
+    parser.add_argument(
+        "--timing",
+        choices=("original", "rate"),
+        default="rate",
+        help="replay a trace at its timestamps or at --rate",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="messages by s, 0 for no limit"
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="messages in flight")
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=1,
+        help="tagged messages in flight by virtual patch of the mix",
+    )
+    parser.add_argument("--duration", type=float, default=10, help="mix duration s")
+    parser.add_argument(
+        "--timeout", type=float, default=5, help="max wait of a reply in s"
+    )
+    args = parser.parse_args(args)
+
+    asyncio.run(LoadGenerator(args).run())
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -22,9 +22,18 @@
 #
 #
 
+from concurrent.futures import ProcessPoolExecutor
 from os import path
 from os.path import dirname, basename, splitext, join
 import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
 
 from PdParser import *
 
@@ -72,22 +81,17 @@ def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
-# process the input file and print the result in stdout
-def main():
-    parser = argparse.ArgumentParser(description="Beautify a PureData patch")
-    parser.add_argument("--icon", type=str, help="GIF to show as icon", dest="icon")
-    parser.add_argument("input", type=str, help="file to process")
-    parser.add_argument("output", type=str, help="file to store result", default="-")
+class Pass(Exception):
+    """the patch is left as is"""
 
-    args = parser.parse_args()
 
-    filename: str = args.input
+# process the input file and return the result patch
+def beautify(filename: str) -> str:
     patch = Patch.fromFile(filename)
     title, _ = splitext(basename(filename))
 
     if patch.coords and int(patch.coords[0].gop) > 0:
-        eprint("GOP already set, pass.")
-        return 0
+        raise Pass("GOP already set")
 
     # retrieve objects
     allTexts = patch.getDefOfType("text")
@@ -95,8 +99,7 @@ def main():
     outlets = patch.getDefOfType("outlet") + patch.getDefOfType("outlet~")
 
     if not allTexts or (not inlets and not outlets):
-        eprint("nothing to show, pass.")
-        return 0
+        raise Pass("nothing to show")
 
     # GraphOnParent dimensions
     gopWidth = max(
@@ -121,14 +124,15 @@ def main():
         comment = f"Inlet {i}"
 
         # look for comment on top of inlet
-        for text in allTexts:
-            if text.inRect(
-                inlet.x - MAX_TEXT_DISTANCE,
-                inlet.x + MAX_TEXT_DISTANCE,
-                inlet.y - MAX_TEXT_DISTANCE,
-                inlet.y,
-            ):
-                comment = text.value
+        texts = patch.defsInRect(
+            inlet.x - MAX_TEXT_DISTANCE,
+            inlet.x + MAX_TEXT_DISTANCE,
+            inlet.y - MAX_TEXT_DISTANCE,
+            inlet.y,
+            "text",
+        )
+        if texts:
+            comment = texts[-1].value
 
         patch.addDef(cnvSocket(gopLeft + socketDeltaX * i, gopTop))
         patch.addDef(
@@ -215,14 +219,15 @@ def main():
         comment = f"Outlet {i}"
 
         # look for comment on bottom of outlet
-        for text in allTexts:
-            if text.inRect(
-                outlet.x - MAX_TEXT_DISTANCE,
-                outlet.x + MAX_TEXT_DISTANCE,
-                outlet.y,
-                outlet.y + MAX_TEXT_DISTANCE,
-            ):
-                comment = text.value
+        texts = patch.defsInRect(
+            outlet.x - MAX_TEXT_DISTANCE,
+            outlet.x + MAX_TEXT_DISTANCE,
+            outlet.y,
+            outlet.y + MAX_TEXT_DISTANCE,
+            "text",
+        )
+        if texts:
+            comment = texts[-1].value
 
         patch.addDef(
             cnvSocket(gopLeft + socketDeltaX * i, gopTop + gopHeight - SOCKET_HEIGHT)
@@ -241,17 +246,186 @@ def main():
     # set GraphOnParent
     patch.setCoords(left=gopLeft, top=gopTop, width=gopWidth, height=gopHeight)
 
+    return f"{patch}\n"
+
+
+#####################
+# BATCH             #
+#####################
+
+# input hash -> output of the former runs, by output tree
+CACHE_PATH = join(path.expanduser("~"), ".cache", "pd-beautician.json")
+
+# the outputs change with the tools too
+TOOL_FILES = [__file__, join(dirname(path.abspath(__file__)), "PdParser.py")]
+
+
+def toolHash() -> str:
+    h = hashlib.sha256()
+    for filename in TOOL_FILES:
+        with open(filename, "rb") as hFile:
+            h.update(hFile.read())
+    return h.hexdigest()
+
+
+def fileHash(filename: str, salt: str) -> str:
+    with open(filename, "rb") as hFile:
+        return hashlib.sha256(salt.encode() + hFile.read()).hexdigest()
+
+
+def writeAtomic(filename: str, text: str):
+    """write in a temporary file of the same directory then rename it"""
+    os.makedirs(dirname(filename) or ".", exist_ok=True)
+    fd, tmpName = tempfile.mkstemp(dir=dirname(filename) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as hFile:
+            hFile.write(text)
+        os.replace(tmpName, filename)
+    except BaseException:
+        os.unlink(tmpName)
+        raise
+
+
+def globRoot(pattern: str) -> str:
+    """the directory part of a glob before its first wildcard"""
+    parts = []
+    for part in pattern.split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    root = os.sep.join(parts)
+    return root if path.isdir(root) else dirname(root)
+
+
+def collect(inputs: list[str]) -> list[tuple[str, str]]:
+    """(file, relative path) of the .pd files of files, directories and globs"""
+    files = []
+    for item in inputs:
+        if path.isdir(item):
+            found = glob.glob(join(item, "**", "*.pd"), recursive=True)
+            root = item
+        else:
+            found = glob.glob(item, recursive=True)
+            root = globRoot(item)
+        files += [(f, path.relpath(f, root)) for f in sorted(found)]
+    return files
+
+
+# worker of the pool, return (status, elapsed s)
+def processFile(task: tuple[str, str]) -> tuple[str, float]:
+    source, destination = task
+    start = time.perf_counter()
+    # any error is reported with the file, the other files go on
+    try:
+        try:
+            text = beautify(source)
+            status = "done"
+        except Pass as e:
+            # keep the output tree complete
+            with open(source, "r") as hFile:
+                text = hFile.read()
+            status = f"copied ({e})"
+        writeAtomic(destination, text)
+    except Exception as e:
+        status = f"ERROR {type(e).__name__} {e}"
+    return status, time.perf_counter() - start
+
+
+def loadCache(cachePath: str, outputDir: str) -> dict:
+    try:
+        with open(cachePath, "r") as hFile:
+            return json.load(hFile).get(path.abspath(outputDir), {})
+    except (OSError, ValueError):
+        return {}
+
+
+def saveCache(cachePath: str, outputDir: str, entries: dict):
+    try:
+        with open(cachePath, "r") as hFile:
+            cache = json.load(hFile)
+    except (OSError, ValueError):
+        cache = {}
+    cache[path.abspath(outputDir)] = entries
+    writeAtomic(cachePath, json.dumps(cache, indent=1))
+
+
+def batch(args) -> int:
+    start = time.perf_counter()
+    files = collect(args.input)
+    cache = {} if args.force else loadCache(args.cache, args.output)
+    salt = toolHash()
+
+    tasks = []
+    hashes = {}
+    skipped = 0
+    for source, relative in files:
+        destination = join(args.output, relative)
+        hashes[destination] = fileHash(source, salt)
+        if cache.get(destination) == hashes[destination] and path.exists(destination):
+            skipped += 1
+            continue
+        tasks.append((source, destination))
+
+    errors = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for (source, destination), (status, elapsed) in zip(
+            tasks, executor.map(processFile, tasks, chunksize=4)
+        ):
+            print(f"{elapsed * 1000:8.1f} ms  {source} : {status}")
+            if status.startswith("ERROR"):
+                errors += 1
+                hashes.pop(destination)
+
+    saveCache(args.cache, args.output, hashes)
+    print(
+        f"{len(tasks)} processed, {skipped} unchanged, {errors} errors"
+        f" in {time.perf_counter() - start:.2f} s"
+    )
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Beautify a PureData patch")
+    parser.add_argument("--icon", type=str, help="GIF to show as icon", dest="icon")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="process files, directories and globs to the output directory",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="batch processes, default CPU count"
+    )
+    parser.add_argument(
+        "--cache", type=str, default=CACHE_PATH, help="batch cache of the inputs hash"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="batch process even unchanged files"
+    )
+    parser.add_argument("input", type=str, nargs="+", help="file to process")
+    parser.add_argument("output", type=str, help="file to store result", default="-")
+
+    args = parser.parse_args()
+
+    if args.batch:
+        return batch(args)
+    if len(args.input) > 1:
+        parser.error("only one input without --batch")
+
+    # process the input file and print the result in stdout
+    try:
+        result = beautify(args.input[0])
+    except Pass as e:
+        eprint(f"{e}, pass.")
+        return 0
+
     # output result patch
     if args.output != "-":
-        output_stream = open(args.output, "w")
+        with open(args.output, "w") as output_stream:
+            output_stream.write(result)
     else:
-        output_stream = sys.stdout
-
-    print(str(patch), file=output_stream)
+        sys.stdout.write(result)
     return 0
 
 
 if __name__ == "__main__":
-    import sys
-
     sys.exit(main())
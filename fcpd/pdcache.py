@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  pdcache.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module memoizes the results of the Part and Part.Shape calls
+#  the key is (function, argument keys), a shape is keyed by its hashCode
+#  (same OCC shape and location) or by the digest of its BREP (same geometry)
+#  results are kept in a LRU bounded by their estimated memory size
+#  the cache is off until a memory budget is set, see the cache_size pref
+
+## @package pdcache
+
+import collections
+import hashlib
+import sys
+
+import FreeCAD as App
+
+from . import pdjobs
+
+userPref = App.ParamGet("User parameter:BaseApp/Preferences/Mod/FCPD")
+
+# bytes by MB of the cache_size preference
+MB = 1 << 20
+
+# Part.Shape methods and Part functions with a result depending on the
+#  arguments only, the exports write files and are always run
+CACHED_METHODS = frozenset(
+    m for m in pdjobs.SHAPE_METHODS if not m.startswith("export")
+)
+CACHED_FUNCTIONS = pdjobs.PART_FUNCTIONS
+
+
+class Uncacheable(Exception):
+    """a value without key, the call is not memoized"""
+
+
+## key of a call, compared by its values only
+#  a hashCode is the address of the OCC shape, the key keeps the input shapes
+#  so this address is not reused by another shape while the entry lives
+class CallKey:
+    __slots__ = ("values", "shapes")
+
+    def __init__(self, values, shapes):
+        self.values = values
+        self.shapes = shapes
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __eq__(self, other):
+        return isinstance(other, CallKey) and self.values == other.values
+
+
+def shapeKey(shape, brepKey=False, shapes=None):
+    if brepKey:
+        digest = hashlib.sha1(shape.exportBrepToString().encode("utf8"))
+        return ("brep", digest.hexdigest())
+    if shapes is not None:
+        shapes.append(shape)
+    return ("shape", shape.hashCode())
+
+
+def valueKey(value, brepKey=False, shapes=None):
+    """a hashable key of a message value, its hashed shapes go in shapes"""
+    import Part
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Part.Shape):
+        return shapeKey(value, brepKey, shapes)
+    if isinstance(value, App.DocumentObject) and hasattr(value, "Shape"):
+        return shapeKey(value.Shape, brepKey, shapes)
+    if isinstance(value, App.Vector):
+        return ("vector", value.x, value.y, value.z)
+    if isinstance(value, App.Rotation):
+        return ("rotation",) + tuple(value.Q)
+    if isinstance(value, App.Placement):
+        return ("placement",) + tuple(value.toMatrix().A)
+    if isinstance(value, (list, tuple)):
+        return tuple(valueKey(v, brepKey, shapes) for v in value)
+    raise Uncacheable(type(value).__name__)
+
+
+def sizeOf(value):
+    """estimated memory size of a result"""
+    if hasattr(value, "MemSize"):
+        return value.MemSize
+    if isinstance(value, (list, tuple)):
+        return sum(sizeOf(v) for v in value)
+    return sys.getsizeof(value)
+
+
+## LRU of the geometry results, bounded by their memory size
+class GeometryCache:
+    def __init__(self, budget=0, brepKey=False):
+        # CallKey -> (value, size of the value and the key shapes)
+        self.entries = collections.OrderedDict()
+        self.budget = budget
+        self.brepKey = brepKey
+        self.size = 0
+        self.reset()
+
+    @property
+    def enabled(self):
+        return self.budget > 0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    ## key of a call, None if the cache is off or an argument has no key
+    #  @param self
+    #  @param name the function name
+    #  @param args the call arguments, the shape first for a method
+    def key(self, name, *args):
+        if not self.enabled:
+            return None
+        shapes = []
+        try:
+            return CallKey((name, valueKey(args, self.brepKey, shapes)), shapes)
+        except Uncacheable:
+            return None
+
+    def get(self, key):
+        """the cached result or None, shapes are copied as PD may modify them"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return copyResult(entry[0])
+
+    def put(self, key, value):
+        if key is None or value is None:
+            return
+        # the input shapes kept by the key count too
+        size = sizeOf(value) + sizeOf(key.shapes)
+        if size > self.budget:
+            return
+        if key in self.entries:
+            # the new key keeps the shapes of this call
+            self.size -= self.entries.pop(key)[1]
+        self.entries[key] = (copyResult(value), size)
+        self.size += size
+        self.evict()
+
+    def evict(self):
+        while self.size > self.budget and self.entries:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def table(self):
+        """[hits count misses count evictions count entries count bytes count]"""
+        return [
+            "hits",
+            self.hits,
+            "misses",
+            self.misses,
+            "evictions",
+            self.evictions,
+            "entries",
+            len(self.entries),
+            "bytes",
+            self.size,
+        ]
+
+
+def copyResult(value):
+    """copy the mutable parts of a result, as generalFuse or distToShape ones"""
+    import Part
+
+    if isinstance(value, Part.Shape):
+        return value.copy()
+    if isinstance(value, App.Vector):
+        return App.Vector(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(copyResult(v) for v in value)
+    return value
+
+
+cache = GeometryCache(
+    userPref.GetInt("cache_size", 0) * MB, userPref.GetBool("cache_brep_key", False)
+)
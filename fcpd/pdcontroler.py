@@ -27,13 +27,113 @@
 import FreeCAD as App
 import fcpdwb_locator as locator
 
+from . import pdlog, pdmsgtranslator
+
+PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
+
+# values closer than EPSILON are not sent again
+EPSILON = 1e-9
+
+logger = pdlog.getLogger("tools")
+
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
 
 
+def isSameValue(val1, val2, eps=EPSILON):
+    """compare two dataflow values, floats and geometry are compared with eps"""
+    if type(val1) is not type(val2):
+        return False
+    if isinstance(val1, float):
+        return abs(val1 - val2) <= eps
+    if isinstance(val1, App.Vector):
+        return val1.isEqual(val2, eps)
+    if isinstance(val1, (App.Rotation, App.Placement)):
+        return val1.isSame(val2, eps)
+    return val1 == val2
+
+
+def propertyType(typ):
+    """return the FreeCAD property type used to store a dataflow type"""
+    # App:PropertyRotation doesn't exist so store it in a placement
+    if typ == PDMsgTranslator.ROTATION:
+        return PDMsgTranslator.PLACEMENT
+    return typ
+
+
+class DataFlowSlot:
+    """a DataFlow_N property with its type, value parser and last value"""
+
+    __slots__ = ("name", "type", "parser", "value")
+
+    def __init__(self, name, typ, parser=None, value=None):
+        self.name = name
+        self.type = typ
+        self.parser = parser
+        self.value = value
+
+
+class DataFlowSlots:
+    """typed slot table of the DataFlow_N properties of an object
+    index -> DataFlowSlot, there is no limit on the slot count"""
+
+    PREFIX = "DataFlow_"
+
+    def __init__(self, obj, doc, readOnly=False):
+        self.obj = obj
+        self.doc = doc
+        self.readOnly = readOnly
+        self.slots = {}
+
+        # adopt the properties already there (document restored)
+        for name in obj.PropertiesList:
+            if name.startswith(self.PREFIX):
+                ind = int(name[len(self.PREFIX) :])
+                typ = obj.getTypeIdOfProperty(name)
+                parser = PDMsgTranslator.typedParser(typ)
+                self.slots[ind] = DataFlowSlot(name, typ, parser)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, ind):
+        return self.slots.get(ind)
+
+    def setType(self, ind, typ):
+        """create the slot ind, an existent slot is kept if its type is the same"""
+        parser = PDMsgTranslator.typedParser(typ)
+        typ = propertyType(typ)
+        slot = self.slots.get(ind)
+        if slot is not None:
+            slot.parser = parser
+            if slot.type == typ:
+                return slot
+            self.obj.removeProperty(slot.name)
+
+        name = f"{self.PREFIX}{ind}"
+        self.obj.addProperty(typ, name, "", self.doc)
+        if self.readOnly:
+            self.obj.setPropertyStatus(name, "ReadOnly")
+        slot = DataFlowSlot(name, typ, parser)
+        self.slots[ind] = slot
+        return slot
+
+    def setTypes(self, types):
+        """set all the slot types at once, slots out of types are removed"""
+        self.remove([ind for ind in self.slots if ind >= len(types)])
+        for ind, typ in enumerate(types):
+            self.setType(ind, typ)
+
+    def remove(self, indexes):
+        for ind in indexes:
+            self.obj.removeProperty(self.slots.pop(ind).name)
+
+    def clear(self):
+        self.remove(list(self.slots))
+
+
 class PDControler:
     def __init__(self, obj, controlerInput, controlerOutput):
 
@@ -43,6 +143,9 @@ class PDControler:
         self.controlerInput = controlerInput
         self.controlerOutput = controlerOutput
 
+        self.inSlots = DataFlowSlots(controlerInput, "IncommingDataFlow", True)
+        self.outSlots = DataFlowSlots(controlerOutput, "OutgoingDataFlow")
+
         obj.Group = [self.controlerInput, self.controlerOutput]
         obj.setPropertyStatus("Group", "ReadOnly")
 
@@ -52,74 +155,90 @@ class PDControler:
                 obj.Group = [self.controlerInput, self.controlerOutput]
 
     def resetIncommingProperties(self):
-        for ind in range(20):
-            name = f"DataFlow_{ind}"
-            # Check existence
-            if hasattr(App.ActiveDocument.IncommingData, name):
-                App.ActiveDocument.IncommingData.removeProperty(name)
-            else:
-                break
+        self.inSlots.clear()
 
     def resetOutgoingProperties(self):
-        for ind in range(20):
-            name = f"DataFlow_{ind}"
-            # Check existence
-            if hasattr(App.ActiveDocument.OutgoingData, name):
-                App.ActiveDocument.OutgoingData.removeProperty(name)
-            else:
-                break
+        self.outSlots.clear()
 
     def setIncommingPropertyType(self, ind, typ):
-        name = f"DataFlow_{ind}"
-        if ind >= 20:
-            raise (AttributeError("Too many properties, maximum is 20."))
-
-        # Check existence
-        if hasattr(App.ActiveDocument.IncommingData, name):
-            App.ActiveDocument.IncommingData.removeProperty(name)
-
-        # App:PropertyRotation doesn't exist so store it in a placement
-        if typ == "rotation":
-            typ = "App::PropertyPlacement"
-
-        self.controlerInput.addProperty(typ, name, "", "IncommingDataFlow")
-        self.controlerInput.setPropertyStatus(name, "ReadOnly")
+        self.inSlots.setType(ind, typ)
 
     def setOutgoingPropertyType(self, ind, typ):
-        name = f"DataFlow_{ind}"
-        if ind >= 20:
-            raise (AttributeError("Too many properties, maximum is 20."))
-
-        # Check existence
-        if hasattr(App.ActiveDocument.OutgoingData, name):
-            App.ActiveDocument.OutgoingData.removeProperty(name)
+        self.outSlots.setType(ind, typ)
 
-        # App:PropertyRotation doesn't exist so store it in a placement
-        if typ == "rotation":
-            typ = "App::PropertyPlacement"
+    def setIncommingPropertyTypes(self, types):
+        """declare all the incomming types, unchanged properties are kept"""
+        self.inSlots.setTypes(types)
 
-        self.controlerOutput.addProperty(typ, name, "", "OutgoingDataFlow")
+    def setOutgoingPropertyTypes(self, types):
+        """declare all the outgoing types, unchanged properties are kept"""
+        self.outSlots.setTypes(types)
+        # PD outlets are recreated, all the values have to be sent again
+        if isinstance(self.controlerOutput.Proxy, PDControlerOutput):
+            self.controlerOutput.Proxy.lastSent.clear()
 
     def setProperty(self, ind, typ, value):
-        name = f"DataFlow_{ind}"
+        logger.log("FCPD", "setProperty %s %s %s\n", ind, typ, value)
 
-        Log(f"setProperty {ind} {typ} {str(value)}\n")
+        slot = self.inSlots.get(ind)
+        if slot is None:
+            slot = self.inSlots.setType(ind, typ)
 
         # App:PropertyRotation doesn't exist so store it in a placement
-        if typ == "rotation":
+        if isinstance(value, App.Rotation) and slot.type == PDMsgTranslator.PLACEMENT:
             value = App.Placement(App.Vector(0, 0, 0), value)
 
-        if not hasattr(self.controlerInput, name):
-            self.setIncommingPropertyType(ind, typ)
+        if slot.value is not None and isSameValue(value, slot.value):
+            return ""
 
         try:
-            setattr(self.controlerInput, name, value)
+            setattr(self.controlerInput, slot.name, value)
+            slot.value = value
         except AttributeError:
             # triggered at document load, to be fixed later
             pass
 
         return ""
 
+    def setValues(self, words):
+        """set incomming values from [index value index value ...] words
+        values are parsed with the declared slot types, then all written at once"""
+        updates = []
+        pos = 0
+        count = len(words)
+        while pos < count:
+            ind = int(words[pos])
+            pos += 1
+            slot = self.inSlots.get(ind)
+            value = None
+            if slot is not None and slot.parser is not None:
+                try:
+                    value, pos = slot.parser(words, pos)
+                except (ValueError, IndexError):
+                    pass
+            if value is None:
+                # undeclared slot or unexpected value, use type inference
+                val, used = PDMsgTranslator.valueFromStr(words[pos:])
+                pos += used
+                if slot is None:
+                    slot = self.inSlots.setType(ind, val.type)
+                value = val.value
+            updates.append((slot, value))
+
+        for slot, value in updates:
+            # App:PropertyRotation doesn't exist so store it in a placement
+            if isinstance(value, App.Rotation):
+                if slot.type == PDMsgTranslator.PLACEMENT:
+                    value = App.Placement(App.Vector(0, 0, 0), value)
+            if slot.value is not None and isSameValue(value, slot.value):
+                continue
+            try:
+                setattr(self.controlerInput, slot.name, value)
+                slot.value = value
+            except AttributeError:
+                # triggered at document load, to be fixed later
+                pass
+
     def __getstate__(self):
         return None
 
@@ -159,19 +278,32 @@ class PDControlerOutput:
         self.pdServer = pdServer
         self.dollarZero = dollarZero
 
-        self.propToSend = []
+        self.propToSend = set()
+        self.lastSent = {}
 
     def onChanged(self, obj, prop):
         if not prop[:8] == "DataFlow":
             return
-        self.propToSend.append(prop)
+        self.propToSend.add(prop)
 
     def execute(self, obj):
-        # send changed properties right to left
-        for prop in sorted(set(self.propToSend), reverse=True):
-            ind = int(prop[9:])
-            self.pdServer.send(self.dollarZero, ind, getattr(obj, prop))
-        self.propToSend = []
+        # send changed properties right to left in one message
+        #  batch count1 index1 value1 count2 index2 value2 ...
+        #  count is the words count of index + value
+        batch = []
+        for prop in sorted(self.propToSend, key=lambda p: int(p[9:]), reverse=True):
+            value = getattr(obj, prop)
+            if prop in self.lastSent and isSameValue(value, self.lastSent[prop]):
+                continue
+            self.lastSent[prop] = value
+            valStr = PDMsgTranslator.strFromValue(value)
+            batch.append(f"{len(valStr.split()) + 1} {prop[9:]} {valStr}")
+        self.propToSend = set()
+        if batch:
+            # the outputs are declared by newctrlr
+            self.pdServer.send(
+                self.dollarZero, "batch", " ".join(batch), command="newctrlr"
+            )
 
     def __getstate__(self):
         return None
@@ -183,21 +315,48 @@ def isPDControler(obj):
     return False
 
 
+# one controler group by PD [fc_controler] instance
+controlers = {}  # $0 -> PDControler document object
+
+
+def isUsable(obj):
+    """check if a stored controler is still in the active document"""
+    try:
+        return obj.Document == App.ActiveDocument
+    except (RuntimeError, ReferenceError):
+        # deleted object
+        return False
+
+
+def release():
+    """forget the $0 of a closed connection
+    the next connection, with new $0, adopts their groups again"""
+    controlers.clear()
+
+
+def findFreeControler():
+    """return a PDControler of the active document not used by any $0"""
+    used = [o.Name for o in controlers.values() if isUsable(o)]
+    for obj in App.ActiveDocument.Objects:
+        if isinstance(getattr(obj, "Proxy", None), PDControler):
+            if obj.Name not in used and len(obj.Group) == 2:
+                return obj
+    return None
+
+
 def create(pdServer, dollarZero):
-    # get an existent PDControler or create new one
-    if hasattr(App.ActiveDocument, "OutgoingData"):
-        pdOut = App.ActiveDocument.OutgoingData
+    # get the PDControler of this $0
+    obj = controlers.get(dollarZero)
+    if obj is not None and isUsable(obj):
+        return obj
+
+    # or an existent free one (document restored) or create new one
+    obj = findFreeControler()
+    if obj is not None:
+        pdIn, pdOut = obj.Group
     else:
         pdOut = App.ActiveDocument.addObject("App::FeaturePython", "OutgoingData")
-
-    if hasattr(App.ActiveDocument, "IncommingData"):
-        pdIn = App.ActiveDocument.IncommingData
-    else:
         pdIn = App.ActiveDocument.addObject("App::FeaturePython", "IncommingData")
-
-    if hasattr(App.ActiveDocument, "PDControler"):
-        obj = App.ActiveDocument.PDControler
-    else:
         obj = App.ActiveDocument.addObject(
             "App::DocumentObjectGroupPython", "PDControler"
         )
@@ -207,9 +366,11 @@ def create(pdServer, dollarZero):
 
     if not hasattr(pdOut, "propToSend"):
         PDControlerOutput(pdOut, pdServer, dollarZero)
+    pdOut.Proxy.dollarZero = dollarZero
 
     if not hasattr(obj, "controlerInput"):
         PDControler(obj, pdIn, pdOut)
         PDControlerViewProvider(obj.ViewObject)
 
+    controlers[dollarZero] = obj
     return obj
@@ -33,7 +33,6 @@ from . import pdmsgtranslator
 PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
 
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
@@ -48,18 +47,12 @@ def registerToolList(pdServer):
 
 def pdCtrlr(pdServer, words):
     pdControler = pdcontroler.create(pdServer, words[0])
-    _, values = PDMsgTranslator.popValues(words[2:])
-    # create a list of (ind, ROValue)
-    duplet = [(values[i].value, values[i + 1]) for i in range(0, len(values), 2)]
-
-    for ind, val in duplet:
-        pdControler.Proxy.setProperty(ind, val.type, val.value)
+    # values are parsed with the types declared by newctrlr
+    pdControler.Proxy.setValues(words[2:])
 
 
 def pdNewCtrlr(pdServer, words):
     pdControler = pdcontroler.create(pdServer, words[0])
-    pdControler.Proxy.resetIncommingProperties()
-    pdControler.Proxy.resetOutgoingProperties()
 
     try:
         outStart = words.index("|")
@@ -68,7 +61,6 @@ def pdNewCtrlr(pdServer, words):
     inTyp = [PDMsgTranslator.fcType(w) for w in words[2:outStart]]
     outTyp = [PDMsgTranslator.fcType(w) for w in words[outStart + 1 :]]
 
-    for ind, t in enumerate(inTyp):
-        pdControler.Proxy.setIncommingPropertyType(ind, t)
-    for ind, t in enumerate(outTyp):
-        pdControler.Proxy.setOutgoingPropertyType(ind, t)
+    # properties whose type did not change are kept
+    pdControler.Proxy.setIncommingPropertyTypes(inTyp)
+    pdControler.Proxy.setOutgoingPropertyTypes(outTyp)
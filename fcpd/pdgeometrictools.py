@@ -23,6 +23,7 @@
 #
 ###################################################################################
 
+import numpy as np
 from scipy.spatial.transform import Rotation
 
 import FreeCAD as App
@@ -32,7 +33,6 @@ from . import pdmsgtranslator
 PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
 
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
@@ -41,11 +41,21 @@ Err = App.Console.PrintError
 def registerToolList(pdServer):
     toolList = [
         ("matrixPlacement", pdMatrixPlacement),
+        ("matrix16", pdMatrix16),
+        ("setMatrixPlacements", pdSetMatrixPlacements),
         ("ypr2rpy", pdYPRtoRPY),
         ("rotationadd", pdRotationAdd),
         ("rotationminus", pdRotationMinus),
         ("placementadd", pdPlacementAdd),
         ("placementminus", pdPlacementMinus),
+        ("ypr2rpys", pdYPRtoRPYs),
+        ("rotationsadd", pdRotationsAdd),
+        ("rotationsminus", pdRotationsMinus),
+        ("rotationsinvert", pdRotationsInvert),
+        ("placementsadd", pdPlacementsAdd),
+        ("placementsminus", pdPlacementsMinus),
+        ("placementsinvert", pdPlacementsInvert),
+        ("chain", pdChain),
     ]
     for word, func in toolList:
         pdServer.registerMessageHandler([word], func)
@@ -54,6 +64,9 @@ def registerToolList(pdServer):
 def pdMatrixPlacement(pdServer, words):
     # matrix as list -> Placement
     # or numpy.matrix -> Placement
+    if words[2:4] == ["list", "16"] and len(words) == 20:
+        # fixed shape, no need of the generic parser
+        return matrixToPlacement(words[4:])
     val, _ = PDMsgTranslator.valueFromStr(words[2:])
     val = val.value
     if hasattr(val, "flatten"):
@@ -62,6 +75,47 @@ def pdMatrixPlacement(pdServer, words):
     return App.Placement(App.Matrix(*val))
 
 
+###################################################
+# MATRIX STREAMS                                  #
+# 4x4 matrices as 16 floats in row-major order
+
+MATRIX_SIZE = 16
+
+
+def matrixToPlacement(values):
+    return App.Placement(App.Matrix(*map(float, values)))
+
+
+def pdMatrix16(pdServer, words):
+    # m11 m12 ... m44 -> Placement
+    if len(words) != MATRIX_SIZE + 2:
+        raise ValueError(f"matrix16 needs {MATRIX_SIZE} floats")
+    return matrixToPlacement(words[2:])
+
+
+def pdSetMatrixPlacements(pdServer, words):
+    # Object1 m11 ... m44 Object2 m11 ... m44 ... -> None | ERROR
+    # set the placements of several objects from one message
+    if (len(words) - 2) % (MATRIX_SIZE + 1):
+        raise ValueError(f"setMatrixPlacements needs Object + {MATRIX_SIZE} floats")
+    rows = np.array(words[2:], dtype=object).reshape(-1, MATRIX_SIZE + 1)
+    matrices = rows[:, 1:].astype(float)
+    doc = App.ActiveDocument
+    # find all the objects first, an unknown one moves none
+    objects = []
+    for name in rows[:, 0]:
+        obj = doc.getObject(name) or next(iter(doc.getObjectsByLabel(name)), None)
+        if obj is None:
+            return f"ERROR unknown object {name}"
+        objects.append(obj)
+    for obj, matrix in zip(objects, matrices):
+        obj.Placement = App.Placement(App.Matrix(*matrix))
+
+
+#                                  MATRIX STREAMS #
+###################################################
+
+
 def pdYPRtoRPY(pdServer, words):
     # FreeCAD rotations use ZYX convention in deg, return xyz one in rad
     # Rotation -> list
@@ -101,3 +155,190 @@ def pdPlacementMinus(pdServer, words):
     p1 = val[0].value
     p2 = val[1].value
     return p2.inverse() * p1
+
+
+###################################################
+# BATCH OPERATIONS                                #
+# lists of N rotations or placements are processed in one scipy call
+# a list of one element is broadcasted to the other list length
+
+
+def asList(val):
+    if isinstance(val, list):
+        return val
+    return [val]
+
+
+def rotationsFromFC(rotations):
+    # FreeCAD and scipy both use (x, y, z, w) quaternions
+    quats = np.array([r.Q for r in rotations], dtype=float)
+    if len(quats) == 1:
+        return Rotation.from_quat(quats[0])
+    return Rotation.from_quat(quats)
+
+
+def rotationsToFC(rotations):
+    quats = rotations.as_quat()
+    if quats.ndim == 1:
+        return [App.Rotation(*quats)]
+    return [App.Rotation(*q) for q in quats]
+
+
+def placementsFromFC(placements):
+    bases = np.array([tuple(p.Base) for p in placements], dtype=float)
+    return bases, rotationsFromFC([p.Rotation for p in placements])
+
+
+def placementsToFC(bases, rotations):
+    bases = np.atleast_2d(bases)
+    rotations = rotationsToFC(rotations)
+    # broadcast a single rotation or base
+    if len(rotations) == 1:
+        rotations = rotations * len(bases)
+    elif len(bases) == 1:
+        bases = np.repeat(bases, len(rotations), axis=0)
+    return [App.Placement(App.Vector(*b), r) for b, r in zip(bases, rotations)]
+
+
+def pdYPRtoRPYs(pdServer, words):
+    # [Rotations] -> [x y z] in rad for each rotation
+    val, _ = PDMsgTranslator.valueFromStr(words[2:])
+    angles = rotationsFromFC(asList(val.value)).as_euler("xyz")
+    return np.atleast_2d(angles).flatten().tolist()
+
+
+def pdRotationsAdd(pdServer, words):
+    # [Rotations], [Rotations] -> [Rotations]
+    _, val = PDMsgTranslator.popValues(words[2:], 2)
+    r1 = rotationsFromFC(asList(val[0].value))
+    r2 = rotationsFromFC(asList(val[1].value))
+    return rotationsToFC(r1 * r2)
+
+
+def pdRotationsMinus(pdServer, words):
+    # [Rotations], [Rotations] -> [Rotations]
+    _, val = PDMsgTranslator.popValues(words[2:], 2)
+    r1 = rotationsFromFC(asList(val[0].value))
+    r2 = rotationsFromFC(asList(val[1].value))
+    return rotationsToFC(r1 * r2.inv())
+
+
+def pdRotationsInvert(pdServer, words):
+    # [Rotations] -> [Rotations]
+    val, _ = PDMsgTranslator.valueFromStr(words[2:])
+    return rotationsToFC(rotationsFromFC(asList(val.value)).inv())
+
+
+def pdPlacementsAdd(pdServer, words):
+    # [Placements], [Placements] -> [Placements]
+    # p1 * p2 : R1.R2, t1 + R1.t2
+    _, val = PDMsgTranslator.popValues(words[2:], 2)
+    t1, r1 = placementsFromFC(asList(val[0].value))
+    t2, r2 = placementsFromFC(asList(val[1].value))
+    return placementsToFC(t1 + r1.apply(t2), r1 * r2)
+
+
+def pdPlacementsMinus(pdServer, words):
+    # [Placements], [Placements] -> [Placements]
+    # p2^-1 * p1 : R2^-1.R1, R2^-1.(t1 - t2)
+    _, val = PDMsgTranslator.popValues(words[2:], 2)
+    t1, r1 = placementsFromFC(asList(val[0].value))
+    t2, r2 = placementsFromFC(asList(val[1].value))
+    r2inv = r2.inv()
+    return placementsToFC(r2inv.apply(t1 - t2), r2inv * r1)
+
+
+def pdPlacementsInvert(pdServer, words):
+    # [Placements] -> [Placements]
+    # p^-1 : R^-1, -R^-1.t
+    val, _ = PDMsgTranslator.valueFromStr(words[2:])
+    t, r = placementsFromFC(asList(val.value))
+    rinv = r.inv()
+    return placementsToFC(-rinv.apply(t), rinv)
+
+
+#                                BATCH OPERATIONS #
+###################################################
+
+
+###################################################
+# KINEMATIC CHAINS                                #
+# a chain is registered once, then only the joint values are sent
+# all the link placements are computed in one pass and assigned
+
+chains = {}  # name -> KinematicChain
+
+
+class KinematicChain:
+    """serial chain of revolute joints
+    link i placement = link i-1 placement * offset i * Rotation(axis i, angle i)
+    offsets are taken from the placements of the objects at definition time"""
+
+    def __init__(self, objects, axes):
+        self.objects = objects
+        axes = np.array([tuple(a) for a in axes], dtype=float)
+        self.axes = axes / np.linalg.norm(axes, axis=1)[:, None]
+
+        # offset 0 = rest 0, offset i = rest i-1 ^-1 * rest i
+        bases, rotations = placementsFromFC([obj.Placement for obj in objects])
+        rotations = Rotation.from_quat(np.atleast_2d(rotations.as_quat()))
+        parentInv = rotations[:-1].inv()
+        self.offsetBases = bases.copy()
+        self.offsetBases[1:] = parentInv.apply(bases[1:] - bases[:-1])
+        self.offsetRotations = Rotation.concatenate(
+            [rotations[:1], parentInv * rotations[1:]]
+        )
+
+    def __len__(self):
+        return len(self.objects)
+
+    def solve(self, angles):
+        """joint angles in deg -> link placements as (bases, Rotation)
+        missing angles are 0, extra ones are ignored"""
+        q = np.zeros(len(self))
+        angles = np.asarray(angles[: len(self)], dtype=float)
+        q[: len(angles)] = np.radians(angles)
+
+        # local transforms of all the links at once
+        joints = Rotation.from_rotvec(self.axes * q[:, None])
+        local = np.zeros((len(self), 4, 4))
+        local[:, :3, :3] = (self.offsetRotations * joints).as_matrix()
+        local[:, :3, 3] = self.offsetBases
+        local[:, 3, 3] = 1
+
+        # accumulate along the chain
+        world = np.empty_like(local)
+        world[0] = local[0]
+        for i in range(1, len(self)):
+            world[i] = world[i - 1] @ local[i]
+        return world[:, :3, 3], Rotation.from_matrix(world[:, :3, :3])
+
+    def apply(self, angles):
+        """move the chain objects to the given joint angles"""
+        for obj, plm in zip(self.objects, placementsToFC(*self.solve(angles))):
+            obj.Placement = plm
+
+
+def pdChain(pdServer, words):
+    if words[2] == "define":
+        # chain define Name Object1 Axis1 Object2 Axis2 ... --> links count
+        _, val = PDMsgTranslator.popValues(words[4:])
+        objects = [v.value for v in val[0::2]]
+        axes = [v.value for v in val[1::2]]
+        if not objects or len(objects) != len(axes):
+            raise ValueError("chain define needs Object Axis pairs")
+        chains[words[3]] = KinematicChain(objects, axes)
+        return len(objects)
+    elif words[2] == "set":
+        # chain set Name angle1 angle2 ... --> None
+        chains[words[3]].apply([float(w) for w in words[4:]])
+    elif words[2] == "solve":
+        # chain solve Name angle1 angle2 ... --> [Placements]
+        return placementsToFC(*chains[words[3]].solve([float(w) for w in words[4:]]))
+    elif words[2] == "remove":
+        # chain remove Name --> None
+        chains.pop(words[3], None)
+
+
+#                                KINEMATIC CHAINS #
+###################################################
@@ -23,6 +23,7 @@
 #
 
 import os
+import hashlib
 import tempfile
 import shutil
 import time
@@ -35,15 +36,31 @@ import FreeCADGui as Gui
 import fcpd
 import fcpdwb_locator as locator
 
-DEBUG = True
+from . import pdlog
+
+# delay to wait for the end of a burst of file change events
+CHANGE_DEBOUNCE_MS = 200
+
+logger = pdlog.getLogger("include")
 
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog if DEBUG else lambda *args: None
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
 
 
+def fileDigest(filePath):
+    """return the content hash of a file"""
+    with open(filePath, "rb") as fd:
+        return hashlib.blake2b(fd.read(), digest_size=16).digest()
+
+
+def fileStamp(filePath):
+    """return the (mtime, size) couple of a file, used as a fast path before hashing"""
+    st = os.stat(filePath)
+    return (st.st_mtime_ns, st.st_size)
+
+
 def createPDFile(filePath):
     with open(filePath, "w") as fd:
         fd.writelines("#N canvas 200 200 450 300 12;\n")
@@ -65,7 +82,7 @@ def addCloseDetection(filePath):
         )
         fd.seek(0)
         fd.writelines(newContents)
-    Log("FCPD", "close detection added\n")
+    logger.log("FCPD", "close detection added\n")
 
 
 def hasCloseDetection(filePath):
@@ -90,7 +107,7 @@ def updateCloseDetection(filePath):
             newContents = contents[:lineNumber] + [onClose] + contents[lineNumber + 1 :]
             fd.seek(0)
             fd.writelines(newContents)
-            Log("FCPD", "close detection updated\n")
+            logger.log("FCPD", "close detection updated\n")
     else:
         addCloseDetection(filePath)
 
@@ -103,8 +120,20 @@ class PDInclude:
         obj.addProperty("App::PropertyFileIncluded", "PDFile", "", "")
         self.isOpen = False
         self.docObserver = None
-        self.skipChange = 0
         self.tmpFile = ""
+        self.fs_watcher = None
+        self.resetChangeTracking()
+
+    def resetChangeTracking(self):
+        self.lastStamp = None
+        self.lastDigest = None
+        self.ignoredChanges = 0
+        self.appliedChanges = 0
+        self.changeTimer = None
+
+    def changeStats(self):
+        """return the count of ignored and applied file changes"""
+        return {"ignored": self.ignoredChanges, "applied": self.appliedChanges}
 
     def startEdit(self):
         if not self.isOpen:
@@ -120,14 +149,24 @@ class PDInclude:
 
                 updateCloseDetection(self.tmpFile)
 
+                # the stored file is the reference, changes are compared to it
+                self.resetChangeTracking()
+                self.lastStamp = fileStamp(self.tmpFile)
+                self.lastDigest = fileDigest(self.tmpFile)
+
                 fcpd.pdServer.send(f"0 pd open {fileName} {dirName}")
                 self.isOpen = True
-                self.skipChange = 0
 
                 # watch for file change
                 self.fs_watcher = QtCore.QFileSystemWatcher([self.tmpFile])
                 self.fs_watcher.fileChanged.connect(self.fileChanged)
 
+                # wait for the end of a burst of events before checking the file
+                self.changeTimer = QtCore.QTimer()
+                self.changeTimer.setSingleShot(True)
+                self.changeTimer.setInterval(CHANGE_DEBOUNCE_MS)
+                self.changeTimer.timeout.connect(self.applyChange)
+
                 # auto save pd file when document is saved
                 class MyObserver(object):
                     def __init__(self, target_doc, caller, fileName):
@@ -137,43 +176,76 @@ class PDInclude:
 
                     def slotStartSaveDocument(self, doc, label):
                         if doc == self.target_doc:
-                            Log("FCPD", "Ask PD to save\n")
+                            logger.log("FCPD", "Ask PD to save\n")
                             self.caller.pdServer.send("0 pd-{self.fileName} menusave;")
                             Gui.updateGui()
                             # give PD 500ms to save
                             time.sleep(0.5)
                             # store the file back
-                            self.caller.fileChanged(self.caller.tmpFile)
-                            self.caller.skipChange = 2
+                            self.caller.applyChange()
                             self.caller.object.recompute(True)
 
                 self.docObserver = MyObserver(App.ActiveDocument, self, fileName)
                 App.addDocumentObserver(self.docObserver)
 
     def fileChanged(self, filename):
-        if self.skipChange > 0:
-            self.skipChange -= 1
-        elif os.path.exists(self.tmpFile):
-            Log("FCPD", f"{self.tmpFile} changed\n")
-            self.object.PDFile = self.tmpFile
-            App.ActiveDocument.recompute()
+        if self.changeTimer is not None:
+            # (re)start the delay, only the last event of a burst is processed
+            self.changeTimer.start()
         else:
-            Log("FCPD", f"{self.tmpFile} deleted\n")
+            self.applyChange()
+
+    def applyChange(self):
+        """store the file back if its contents really changed
+        return True if the file was stored"""
+        if not os.path.exists(self.tmpFile):
+            logger.log("FCPD", "%s deleted\n", self.tmpFile)
+            return False
+
+        # some editors replace the file, the watcher then forgets it
+        if self.fs_watcher and self.tmpFile not in self.fs_watcher.files():
+            self.fs_watcher.addPath(self.tmpFile)
+
+        stamp = fileStamp(self.tmpFile)
+        if stamp == self.lastStamp:
+            self.ignoredChanges += 1
+            return False
+        self.lastStamp = stamp
+
+        digest = fileDigest(self.tmpFile)
+        if digest == self.lastDigest:
+            self.ignoredChanges += 1
+            logger.log("FCPD", "%s rewritten without change\n", self.tmpFile)
+            return False
+        self.lastDigest = digest
+
+        logger.log("FCPD", "%s changed\n", self.tmpFile)
+        self.appliedChanges += 1
+        self.object.PDFile = self.tmpFile
+        App.ActiveDocument.recompute()
+        return True
 
     def endEdit(self):
-        Log("FCPD", f"{self.tmpFile} closed\n")
+        logger.log("FCPD", "%s closed\n", self.tmpFile)
+        if self.changeTimer is not None:
+            self.changeTimer.stop()
+            self.changeTimer = None
         try:
             os.remove(self.tmpFile)
             os.remove(self.tmpFile + "_")
             del self.fs_watcher
         except FileNotFoundError:
             pass
+        self.fs_watcher = None
         App.removeDocumentObserver(self.docObserver)
         self.isOpen = False
 
     def onDocumentRestored(self, obj):
         self.object = obj
         self.isOpen = False
+        self.tmpFile = ""
+        self.fs_watcher = None
+        self.resetChangeTracking()
 
     def __getstate__(self):
         return None
@@ -28,7 +28,6 @@
 import FreeCAD as App
 
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
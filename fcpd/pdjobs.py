@@ -0,0 +1,590 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  pdjobs.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module runs the slow geometry calls out of the PureDataServer handlers
+#  a job works on detached Part.Shape copies in a worker thread,
+#  the document and the socket are only used from the main thread
+#  the handler replies the job id, the result is sent later as
+#  "$0 job <id> <result>" to the route of the request
+#  heavy shape operations and Part functions on large shapes go to a pool of
+#  headless FreeCAD processes instead, see fcpdwb_offload
+
+## @package pdjobs
+
+import collections
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PySide import QtCore
+
+import FreeCAD as App
+
+from . import pdlog, pdstats
+
+logger = pdlog.getLogger("tools")
+
+userPref = App.ParamGet("User parameter:BaseApp/Preferences/Mod/FCPD")
+
+# default worker threads and maximum of pending and running jobs
+JOB_WORKERS = 2
+JOB_QUEUE = 16
+
+# ms between two checks of the running jobs
+POLL_INTERVAL = 10
+
+# Part.Shape methods without side effect on the document
+SHAPE_METHODS = frozenset(
+    (
+        "common",
+        "cut",
+        "distToShape",
+        "exportBrep",
+        "exportIges",
+        "exportStep",
+        "exportStl",
+        "extrude",
+        "fuse",
+        "generalFuse",
+        "makeChamfer",
+        "makeFillet",
+        "makeOffset2D",
+        "makeOffsetShape",
+        "makeThickness",
+        "removeSplitter",
+        "revolve",
+        "section",
+        "slice",
+        "tessellate",
+    )
+)
+
+# Part functions without side effect on the document
+PART_FUNCTIONS = frozenset(
+    (
+        "makeCompound",
+        "makeHelix",
+        "makeLoft",
+        "makeRuledSurface",
+        "makeShell",
+        "makeSolid",
+        "makeSweepSurface",
+    )
+)
+
+# Part.Shape methods worth the BREP round trip to a worker process
+OFFLOAD_METHODS = frozenset(
+    (
+        "common",
+        "cut",
+        "fuse",
+        "generalFuse",
+        "makeChamfer",
+        "makeFillet",
+        "makeOffsetShape",
+        "makeThickness",
+        "section",
+    )
+)
+
+# Part functions worth it
+OFFLOAD_FUNCTIONS = frozenset(
+    (
+        "makeLoft",
+        "makeRuledSurface",
+        "makeShell",
+        "makeSolid",
+        "makeSweepSurface",
+    )
+)
+
+# default minimum faces count of the input shapes to use a worker process
+#  smaller ones are faster in a thread than exported, sent and imported
+OFFLOAD_FACES = 200
+
+# sub-shape types and their list in a Part.Shape
+ELEMENT_LISTS = {"Vertex": "Vertexes", "Edge": "Edges", "Face": "Faces"}
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+
+def detach(value):
+    """copy the shapes of a value so a worker can use them"""
+    import Part
+
+    if isinstance(value, Part.Shape):
+        return value.copy()
+    if isinstance(value, App.DocumentObject) and hasattr(value, "Shape"):
+        return value.Shape.copy()
+    if isinstance(value, (list, tuple)):
+        return type(value)(detach(v) for v in value)
+    return value
+
+
+def shapeOf(value):
+    """the Part.Shape of a shape or document object"""
+    if isinstance(value, App.DocumentObject):
+        return value.Shape
+    return value
+
+
+def elementName(shape, element):
+    """name of element in shape, as "Edge3", None if it is not a sub-shape"""
+    listName = ELEMENT_LISTS.get(element.ShapeType)
+    if listName is None:
+        return None
+    for index, sub in enumerate(getattr(shape, listName), 1):
+        if sub.isSame(element):
+            return f"{element.ShapeType}{index}"
+    return None
+
+
+## replace the values of a method call arguments
+#  @param shape the Part.Shape of the method
+#  @param value the arguments, lists and tuples are walked
+#  @param element called with the name of a sub-shape of shape
+#  @param other called with any other value
+def mapElements(shape, value, element, other):
+    import Part
+
+    if isinstance(value, (list, tuple)):
+        return type(value)(mapElements(shape, v, element, other) for v in value)
+    if isinstance(value, Part.Shape):
+        name = elementName(shape, value)
+        if name is not None:
+            return element(name)
+    return other(value)
+
+
+def detachCall(shape, args):
+    """copy a shape and its method arguments so a worker can use them
+    the edges, faces... of the shape become the ones of the copy,
+    as makeFillet needs, separate copies would not be sub-shapes of it"""
+    shape = shapeOf(shape)
+    copy = shape.copy()
+    return copy, mapElements(shape, args, copy.getElement, detach)
+
+
+def facesCount(value):
+    """faces count of the shapes of a value
+    a shape without face, as the wires of a loft, counts its edges"""
+    import Part
+
+    if isinstance(value, App.DocumentObject) and hasattr(value, "Shape"):
+        value = value.Shape
+    if isinstance(value, Part.Shape):
+        return len(value.Faces) or len(value.Edges)
+    if isinstance(value, (list, tuple)):
+        return sum(facesCount(v) for v in value)
+    return 0
+
+
+def pythonExecutable():
+    """the python able to import FreeCAD headless, for the worker processes"""
+    path = userPref.GetString("offload_python", "")
+    if path:
+        return path
+    if os.path.basename(sys.executable).startswith("python"):
+        return sys.executable
+    # FreeCAD binary, look for its bundled python
+    for name in ("python3", "python", "python.exe"):
+        path = os.path.join(App.getHomePath(), "bin", name)
+        if os.path.exists(path):
+            return path
+    return shutil.which("python3") or shutil.which("python")
+
+
+## Persistent pool of headless FreeCAD worker processes
+class ProcessPool:
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = userPref.GetInt(
+                "offload_workers", max(1, (os.cpu_count() or 2) - 1)
+            )
+        self.workers = max(1, workers)
+        self.executor = None
+        self.python = None
+
+    @property
+    def available(self):
+        """False without a python to run the workers, the jobs stay in threads"""
+        if self.python is None:
+            self.python = pythonExecutable() or ""
+            if not self.python:
+                logger.wrn(
+                    "FCPD",
+                    "Jobs : no python found for the worker processes, "
+                    "set the offload_python preference, jobs run in threads\n",
+                )
+        return bool(self.python)
+
+    def start(self):
+        import fcpdwb_offload
+
+        if not self.available:
+            raise RuntimeError("no python found for the worker processes")
+
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(self.python)
+        paths = [
+            os.path.join(App.getHomePath(), "lib"),
+            os.path.dirname(os.path.abspath(fcpdwb_offload.__file__)),
+        ]
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=fcpdwb_offload.initWorker,
+            initargs=(paths,),
+        )
+        # start the workers and their imports now, not at the first job
+        for _ in range(self.workers):
+            self.executor.submit(fcpdwb_offload.ping)
+        logger.log("FCPD", "Jobs : %s worker processes started\n", self.workers)
+
+    def submit(self, func, *args):
+        if self.executor is None:
+            self.start()
+        return self.executor.submit(func, *args)
+
+    ## the workers died, as with a python unable to import FreeCAD
+    #  the pool is not used again, the jobs run in threads
+    def broken(self):
+        if self.python:
+            logger.wrn(
+                "FCPD",
+                "Jobs : the worker processes of %s failed, "
+                "check the offload_python preference, jobs run in threads\n",
+                self.python,
+            )
+        self.python = ""
+        self.shutdown()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+# run in the worker thread
+def timed(func, args):
+    start = pdstats.clock()
+    return func(*args), pdstats.clock() - start
+
+
+class Job:
+    __slots__ = (
+        "id",
+        "route",
+        "name",
+        "future",
+        "decode",
+        "cacheKey",
+        "fallback",
+        "cancelled",
+    )
+
+    def __init__(
+        self, jobId, route, name, future, decode=None, cacheKey=None, fallback=None
+    ):
+        self.id = jobId
+        self.route = route
+        self.name = name
+        self.future = future
+        self.decode = decode
+        self.cacheKey = cacheKey
+        # for a process job, return (func, args) to run it in a thread instead
+        self.fallback = fallback
+        self.cancelled = False
+
+    @property
+    def state(self):
+        if self.cancelled or self.future.cancelled():
+            return CANCELLED
+        if self.future.done():
+            return DONE
+        return RUNNING if self.future.running() else PENDING
+
+
+## Bounded queue of the geometry jobs of a PureDataServer
+class JobQueue:
+    def __init__(self, pdServer, workers=None, size=None):
+        self.pdServer = pdServer
+        if workers is None:
+            workers = userPref.GetInt("job_workers", JOB_WORKERS)
+        if size is None:
+            size = userPref.GetInt("job_queue", JOB_QUEUE)
+        self.workers = max(1, workers)
+        self.size = max(1, size)
+        self.executor = None
+        self.processPool = ProcessPool()
+        self.offloadFaces = userPref.GetInt("offload_faces", OFFLOAD_FACES)
+        self.jobs = collections.OrderedDict()  # id -> Job
+        self.ids = itertools.count(1)
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.poll)
+
+    ## run func(*args) in a worker thread
+    #  @param self
+    #  @param route the reply route of the request
+    #  @param name the job name for the stats and the log
+    #  @param func the function, working on detached values only
+    #  @param cacheKey the pdcache key of the result, None to not keep it
+    #  @return the job id
+    def submit(self, route, name, func, *args, cacheKey=None):
+        self.checkSize()
+        return self.add(route, name, self.threadFuture(func, args), cacheKey=cacheKey)
+
+    def threadFuture(self, func, args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="fcpd-job"
+            )
+        return self.executor.submit(timed, func, args)
+
+    ## a job already done, for a result found in the cache
+    #  it is sent at the next poll as the other jobs results
+    #  @return the job id
+    def submitResult(self, route, name, value):
+        self.checkSize()
+        future = Future()
+        future.set_result((value, 0))
+        return self.add(route, f"{name}@cached", future)
+
+    ## run shape.method(*args) in a worker process if it pays off, else in a thread
+    #  @param self
+    #  @param route the reply route of the request
+    #  @param method the Part.Shape method name
+    #  @param shape the shape or document object
+    #  @param args the method arguments
+    #  @param cacheKey the pdcache key of the result, None to not keep it
+    #  @return the job id
+    def submitShape(self, route, method, shape, args, cacheKey=None):
+        name = f"Shape.{method}"
+
+        def fallback():
+            detached, detachedArgs = detachCall(shape, args)
+            return getattr(detached, method), detachedArgs
+
+        if not self.offloads(method, [shape, args]):
+            func, detachedArgs = fallback()
+            return self.submit(route, name, func, *detachedArgs, cacheKey=cacheKey)
+
+        import fcpdwb_offload
+
+        self.checkSize()
+        target = shapeOf(shape)
+        encodedArgs = mapElements(
+            target,
+            args,
+            fcpdwb_offload.element,
+            lambda value: fcpdwb_offload.encode(detach(value)),
+        )
+        return self.submitProcess(
+            route,
+            name,
+            fallback,
+            cacheKey,
+            fcpdwb_offload.runShapeMethod,
+            method,
+            fcpdwb_offload.encode(target),
+            encodedArgs,
+        )
+
+    ## run Part.function(*args) in a worker process if it pays off, else in a thread
+    #  @param self
+    #  @param route the reply route of the request
+    #  @param function the Part function name
+    #  @param args the function arguments
+    #  @param cacheKey the pdcache key of the result, None to not keep it
+    #  @return the job id
+    def submitFunction(self, route, function, args, cacheKey=None):
+        import Part
+
+        name = f"Part.{function}"
+
+        def fallback():
+            return getattr(Part, function), detach(args)
+
+        if not self.offloads(function, args, OFFLOAD_FUNCTIONS):
+            func, detachedArgs = fallback()
+            return self.submit(route, name, func, *detachedArgs, cacheKey=cacheKey)
+
+        import fcpdwb_offload
+
+        self.checkSize()
+        return self.submitProcess(
+            route,
+            name,
+            fallback,
+            cacheKey,
+            fcpdwb_offload.runPartFunction,
+            function,
+            fcpdwb_offload.encode(detach(args)),
+        )
+
+    ## run func(*args) in a worker process, in a thread if the pool is broken
+    #  @param self
+    #  @param route the reply route of the request
+    #  @param name the job name
+    #  @param fallback return (func, args) to run the job in a thread
+    #  @param cacheKey the pdcache key of the result, None to not keep it
+    #  @return the job id
+    def submitProcess(self, route, name, fallback, cacheKey, func, *args):
+        import fcpdwb_offload
+
+        try:
+            future = self.processPool.submit(func, *args)
+        except BrokenProcessPool:
+            self.processPool.broken()
+            threadFunc, threadArgs = fallback()
+            return self.submit(route, name, threadFunc, *threadArgs, cacheKey=cacheKey)
+        return self.add(
+            route,
+            f"{name}@process",
+            future,
+            fcpdwb_offload.decode,
+            cacheKey,
+            fallback,
+        )
+
+    def offloads(self, name, values, names=OFFLOAD_METHODS):
+        return (
+            name in names
+            and self.offloadFaces >= 0
+            and facesCount(values) >= self.offloadFaces
+            and self.processPool.available
+        )
+
+    def checkSize(self):
+        if len(self.jobs) >= self.size:
+            raise RuntimeError(f"job queue full ({self.size} jobs)")
+
+    def add(self, route, name, future, decode=None, cacheKey=None, fallback=None):
+        job = Job(next(self.ids), route, name, future, decode, cacheKey, fallback)
+        self.jobs[job.id] = job
+        logger.log("FCPD", "Jobs : %s started as job %s\n", name, job.id)
+        if not self.timer.isActive():
+            self.timer.start(POLL_INTERVAL)
+        return job.id
+
+    ## cancel a job, a running one ends but its result is dropped
+    #  @param self
+    #  @param jobId the job id
+    #  @return False if the job is unknown or already done
+    def cancel(self, jobId):
+        job = self.jobs.get(jobId)
+        if job is None:
+            return False
+        # done but not polled yet, its result is sent
+        if job.future.done() and not job.cancelled:
+            return False
+        job.cancelled = True
+        job.future.cancel()
+        return True
+
+    def status(self, jobId):
+        job = self.jobs.get(jobId)
+        return job.state if job else None
+
+    ## send the result of the ended jobs, on the main thread
+    def poll(self):
+        for job in [job for job in self.jobs.values() if job.future.done()]:
+            del self.jobs[job.id]
+            if self.isBroken(job):
+                self.retry(job)
+            else:
+                self.deliver(job)
+        if not self.jobs:
+            self.timer.stop()
+
+    def isBroken(self, job):
+        return (
+            job.fallback is not None
+            and job.state == DONE
+            and isinstance(job.future.exception(), BrokenProcessPool)
+        )
+
+    ## run again in a thread a process job of a broken pool, with the same id
+    def retry(self, job):
+        self.processPool.broken()
+        func, args = job.fallback()
+        job.name = job.name.replace("@process", "")
+        job.future = self.threadFuture(func, args)
+        job.decode = None
+        job.fallback = None
+        self.jobs[job.id] = job
+        logger.log("FCPD", "Jobs : job %s %s moved to a thread\n", job.id, job.name)
+
+    def deliver(self, job):
+        error = False
+        elapsed = 0
+        if job.state == CANCELLED:
+            value = "ERROR job cancelled"
+        else:
+            try:
+                value, elapsed = job.future.result()
+                if job.decode:
+                    value = job.decode(value)
+                if job.cacheKey is not None:
+                    from .pdcache import cache
+
+                    cache.put(job.cacheKey, value)
+            except Exception as e:
+                value = f"ERROR {e}"
+                error = True
+        logger.log("FCPD", "Jobs : job %s %s ended\n", job.id, job.name)
+        # a single word name, the stats table is a flat list of words
+        if self.pdServer.stats.enabled:
+            self.pdServer.stats.record(f"job:{job.name}", 0, elapsed, 0, error)
+        self.pdServer.send(job.route, "job", job.id, value, command=f"job:{job.name}")
+
+    ## cancel all the jobs and stop the workers
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancelled = True
+        self.jobs.clear()
+        self.timer.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.processPool.shutdown()
+
+
+jobQueue = None
+
+
+def getJobQueue(pdServer):
+    global jobQueue
+    if jobQueue is None:
+        jobQueue = JobQueue(pdServer)
+    return jobQueue
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  pdlog.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module implements the FCPD logging layer
+#  each subsystem has its own level set in the FCPD preference page
+#  a disabled level is a no-op : the message is not even formatted
+#  messages go to the FreeCAD console or to a rotating file as JSON lines
+
+## @package pdlog
+
+import json
+import logging
+import logging.handlers
+
+import FreeCAD as App
+
+userPref = App.ParamGet("User parameter:BaseApp/Preferences/Mod/FCPD")
+
+# levels, same order as the preference combo boxes
+ERROR, WARNING, MESSAGE, LOG = range(4)
+LEVEL_NAMES = ("error", "warning", "message", "log")
+
+# subsystem -> default level
+SUBSYSTEMS = {
+    "server": WARNING,
+    "translator": WARNING,
+    "tools": WARNING,
+    "include": WARNING,
+}
+
+# rotating file sink default size in kB and backup count
+LOG_FILE_SIZE = 1024
+LOG_FILE_BACKUPS = 3
+
+CONSOLE = (
+    App.Console.PrintError,
+    App.Console.PrintWarning,
+    App.Console.PrintMessage,
+    App.Console.PrintLog,
+)
+
+
+def noop(*args):
+    pass
+
+
+## JSON lines formatter for the file sink
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(
+            {
+                "time": record.created,
+                "subsystem": record.subsystem,
+                "level": LEVEL_NAMES[record.fcpdLevel],
+                "notifier": record.notifier,
+                "message": record.getMessage().rstrip("\r\n"),
+            }
+        )
+
+
+# None or the python logger of the file sink
+fileLogger = None
+
+
+## Logger of a subsystem
+#  use logger.log("FCPD", "text %s\n", arg) rather than a f-string
+#  so the text is formatted only if the level is enabled
+class Logger:
+    def __init__(self, subsystem, level=WARNING):
+        self.subsystem = subsystem
+        self.setLevel(level)
+
+    def setLevel(self, level):
+        self.level = level
+        self.err, self.wrn, self.msg, self.log = [
+            self.emitter(lvl) if lvl <= level else noop for lvl in range(4)
+        ]
+
+    def emitter(self, level):
+        subsystem = self.subsystem
+        console = CONSOLE[level]
+
+        def emit(notifier, text, *args):
+            if args:
+                text = text % args
+            if fileLogger is None:
+                console(notifier, text)
+                return
+            fileLogger.info(
+                text,
+                extra={
+                    "subsystem": subsystem,
+                    "fcpdLevel": level,
+                    "notifier": notifier,
+                },
+            )
+            # errors are always shown to the user
+            if level == ERROR:
+                console(notifier, text)
+
+        return emit
+
+
+loggers = {}
+
+
+def getLogger(subsystem):
+    """return the logger of subsystem, created with the preference level"""
+    if subsystem not in loggers:
+        loggers[subsystem] = Logger(subsystem, levelPref(subsystem))
+    return loggers[subsystem]
+
+
+def levelPref(subsystem):
+    return userPref.GetInt(f"log_{subsystem}", SUBSYSTEMS.get(subsystem, WARNING))
+
+
+def setFileSink(path, size=LOG_FILE_SIZE, backups=LOG_FILE_BACKUPS):
+    """send the log to a rotating file of size kB, or to the console if path is empty"""
+    global fileLogger
+    if fileLogger is not None:
+        for handler in list(fileLogger.handlers):
+            fileLogger.removeHandler(handler)
+            handler.close()
+        fileLogger = None
+    if not path:
+        return
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=size * 1024, backupCount=backups, encoding="utf8"
+    )
+    handler.setFormatter(JsonFormatter())
+    fileLogger = logging.getLogger("FCPD")
+    fileLogger.propagate = False
+    fileLogger.setLevel(logging.INFO)
+    fileLogger.addHandler(handler)
+
+
+def configure():
+    """apply the FCPD preferences to the loggers and the sink"""
+    for subsystem in set(SUBSYSTEMS) | set(loggers):
+        getLogger(subsystem).setLevel(levelPref(subsystem))
+    setFileSink(
+        userPref.GetString("log_file", ""),
+        userPref.GetInt("log_file_size", LOG_FILE_SIZE),
+    )
@@ -29,8 +29,11 @@ import numbers
 
 import FreeCAD as App
 
+from . import pdlog
+
+logger = pdlog.getLogger("translator")
+
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
@@ -209,7 +212,7 @@ class PDMsgTranslator:
                     index = int(words[0][1:])
                     retValue = cls.objectsStore[index]
                     retType = cls.OBJECT
-                    Log("FCPD", f"{words[0]} refers to {str(retValue)}\n")
+                    logger.log("FCPD", "%s refers to %s\n", words[0], retValue)
                     usedWords = 1
                 elif App.ActiveDocument is not None and App.ActiveDocument.getObject(
                     words[0]
@@ -264,6 +267,16 @@ class PDMsgTranslator:
     def fcType(cls, short):
         return cls.FC_TYPES[cls.SHORT_TYPES.index(short)]
 
+    ## Return a parser for an already known type
+    #  the parser is called with (words, position) and returns (value, next position)
+    #  it raises ValueError or IndexError if the words don't match the type
+    #  @param self
+    #  @param typ one of FC_TYPES
+    #  @return the parser function or None if the type has no fast parser
+    @classmethod
+    def typedParser(cls, typ):
+        return TYPED_PARSERS.get(typ)
+
 
 class ROValue:
     """A read-only typed value"""
@@ -293,3 +306,69 @@ class ROValue:
     def isSet(self):
         """Return True if the value is set"""
         return self._value != PDMsgTranslator.NOT_SET
+
+
+# parsers without type inference, see PDMsgTranslator.typedParser
+def parseFloat(words, pos):
+    return float(words[pos]), pos + 1
+
+
+def parseInt(words, pos):
+    return int(float(words[pos])), pos + 1
+
+
+def parseBool(words, pos):
+    word = words[pos]
+    if word == "True":
+        return True, pos + 1
+    if word == "False":
+        return False, pos + 1
+    return bool(float(word)), pos + 1
+
+
+def parseVector(words, pos):
+    if words[pos] not in ("Vector", "Pos"):
+        raise ValueError(f"{words[pos]} is not a vector")
+    return (
+        App.Vector(float(words[pos + 1]), float(words[pos + 2]), float(words[pos + 3])),
+        pos + 4,
+    )
+
+
+def parseRotation(words, pos):
+    if words[pos] not in ("Rotation", "Yaw-Pitch-Roll", "Rot"):
+        raise ValueError(f"{words[pos]} is not a rotation")
+    return (
+        App.Rotation(
+            float(words[pos + 1]), float(words[pos + 2]), float(words[pos + 3])
+        ),
+        pos + 4,
+    )
+
+
+def parsePlacement(words, pos):
+    # Placement Pos x y z Yaw-Pitch-Roll y p r
+    if words[pos] != "Placement":
+        raise ValueError(f"{words[pos]} is not a placement")
+    return (
+        App.Placement(
+            App.Vector(
+                float(words[pos + 2]), float(words[pos + 3]), float(words[pos + 4])
+            ),
+            App.Rotation(
+                float(words[pos + 6]), float(words[pos + 7]), float(words[pos + 8])
+            ),
+        ),
+        pos + 9,
+    )
+
+
+TYPED_PARSERS = {
+    PDMsgTranslator.FLOAT: parseFloat,
+    PDMsgTranslator.ANGLE: parseFloat,
+    PDMsgTranslator.INT: parseInt,
+    PDMsgTranslator.BOOL: parseBool,
+    PDMsgTranslator.VECTOR: parseVector,
+    PDMsgTranslator.ROTATION: parseRotation,
+    PDMsgTranslator.PLACEMENT: parsePlacement,
+}
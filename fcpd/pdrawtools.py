@@ -34,12 +34,13 @@ import FreeCAD as App
 import fcpdwb_locator as locator
 from fcpdwb_utils import _S
 
-from . import pdmsgtranslator
+from . import pdlog, pdmsgtranslator
 
 PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
 
+logger = pdlog.getLogger("tools")
+
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
@@ -360,18 +361,18 @@ def pdGiveMe(pdServer, words):
     filePath = os.path.join(modulePath, funcName)
 
     if not os.path.isfile(filePath):
-        Log("FCPD", f"PDServer : add {filePath}\n")
+        logger.log("FCPD", "PDServer : add %s\n", filePath)
         try:
-            Log("FCPD", f"PDServer : try to import {moduleName}\n")
+            logger.log("FCPD", "PDServer : try to import %s\n", moduleName)
             exec(f"import {moduleName}")
-            Log("FCPD", "PDServer : import ok\n")
+            logger.log("FCPD", "PDServer : import ok\n")
         except ModuleNotFoundError:
             if args[:-2]:
                 try:
                     className = ".".join(args[:-2])
-                    Log("FCPD", f"PDServer : try to import {className}\n")
+                    logger.log("FCPD", "PDServer : try to import %s\n", className)
                     exec(f"import {className}")
-                    Log("FCPD", "PDServer : import ok\n")
+                    logger.log("FCPD", "PDServer : import ok\n")
                 except ModuleNotFoundError as e:
                     Wrn("FCPD", f"Error : {e}\n")
                     return f"ERROR module not found {className}"
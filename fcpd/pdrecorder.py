@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  pdrecorder.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module records the PureDataServer traffic and replays it
+#  a recording is an append-only file :
+#    MAGIC then records of [direction, timestamp_ns, length] header + utf8 message
+#  timestamps are monotonic, relative to the recording start
+#  a path ending with .gz is gzip compressed
+
+## @package pdrecorder
+
+import gzip
+import os
+import struct
+import time
+
+MAGIC = b"FCPDREC1"
+
+INBOUND = 0
+OUTBOUND = 1
+
+# direction, timestamp in ns, message length
+RECORD_HEADER = struct.Struct("<BqI")
+
+# connection messages and recording commands, not replayed
+CONNECTION_MESSAGES = ("initrcv", "close")
+RECORDING_COMMANDS = ("record",)
+
+# see pdserver.REQUEST_ID
+REQUEST_ID = "rid"
+
+
+def openFile(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+## Record the framed messages of a PureDataServer
+class SessionRecorder:
+    def __init__(self, path):
+        self.path = path
+        isNew = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = openFile(path, "ab")
+        if isNew:
+            self.file.write(MAGIC)
+        self.start = time.monotonic_ns()
+        self.count = 0
+
+    def record(self, direction, msg):
+        data = msg.encode("utf8")
+        self.file.write(
+            RECORD_HEADER.pack(direction, time.monotonic_ns() - self.start, len(data))
+        )
+        self.file.write(data)
+        self.count += 1
+
+    def recordInbound(self, msgList):
+        for msg in msgList:
+            self.record(INBOUND, msg)
+
+    def recordOutbound(self, msg):
+        self.record(OUTBOUND, msg)
+
+    def close(self):
+        self.file.close()
+
+
+def readRecording(path):
+    """yield (direction, timestamp_ns, message) of a recording
+    appended sessions are chained one after the other"""
+    offset = 0
+    last = 0
+    with openFile(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a FCPD recording")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # end of file or last record truncated by a crash
+                return
+            direction, stamp, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            if stamp < last:
+                # next appended session, timestamps restart from 0
+                offset += last
+            last = stamp
+            yield direction, offset + stamp, data.decode("utf8")
+
+
+def replay(pdServer, path, timing="fast"):
+    """feed the inbound messages of a recording to pdServer._pdMsgListProcessor
+    timing is "fast" (as fast as possible) or "original" (recorded delays)
+    return (replies, recorded replies, elapsed s)"""
+    replies = []
+    recorded = []
+    start = time.monotonic_ns()
+    for direction, stamp, msg in readRecording(path):
+        if direction == OUTBOUND:
+            recorded.append(msg)
+            continue
+        # same framing as PureDataServer._pdMsgListProcessor
+        words = msg[:-2].split(" ", 4) + ["", ""]
+        # skip the request id envelope
+        command = words[3] if words[1] == REQUEST_ID else words[1]
+        if words[0] in CONNECTION_MESSAGES or command in RECORDING_COMMANDS:
+            continue
+        if timing == "original":
+            delay = stamp - (time.monotonic_ns() - start)
+            if delay > 0:
+                time.sleep(delay / 1e9)
+        replies += pdServer._pdMsgListProcessor([msg])
+    return replies, recorded, (time.monotonic_ns() - start) / 1e9
+
+
+def toTrace(path, tracePath):
+    """write the inbound messages of a recording as a fudi-loadgen.py text trace"""
+    with open(tracePath, "w") as f:
+        for direction, stamp, msg in readRecording(path):
+            if direction == INBOUND:
+                f.write(f"{stamp / 1e9:.6f}\t{msg.rstrip()}\n")
+    return tracePath
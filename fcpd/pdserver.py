@@ -34,15 +34,20 @@ from PySide.QtNetwork import QTcpServer, QTcpSocket, QHostAddress
 
 import FreeCAD as App
 
-from . import pdmsgtranslator
+from . import pdcontroler, pdjobs, pdlog, pdmsgtranslator, pdrecorder, pdstats
 
 PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
 
-DEBUG = True
 RAISE_ERROR = False
 
+# optional request id envelope, echoed before the reply
+#  "$0 rid <id> command ..." is replied "$0 rid <id> value"
+REQUEST_ID = "rid"
+
+# the messages traffic is logged at LOG level, see the FCPD preferences
+logger = pdlog.getLogger("server")
+
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog if DEBUG else lambda *args: None
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
@@ -67,6 +72,10 @@ class PureDataServer(QtCore.QObject):
         self.writeBuffer = ""
         self.readList = []
         self.observersStore = {}
+        self.stats = pdstats.DispatchStats()
+        self.recorder = None
+        # reply route of the message being processed, for the delayed replies
+        self.route = ""
 
         self.tcpServer = QTcpServer(self)
         self.tcpServer.setMaxPendingConnections(1)
@@ -118,15 +127,25 @@ class PureDataServer(QtCore.QObject):
         except TypeError:
             self.messageHandlerList[first_words] = handler
 
-    def _pdMsgListProcessor(self, msgList):
+    ## process incoming messages
+    #  @param self
+    #  @param msgList the messages, each ending with ";\n"
+    #  @param commands if given, gets the stats command of each reply
+    #  @return the replies
+    def _pdMsgListProcessor(self, msgList, commands=None):
         returnValue = []
+        stats = self.stats if self.stats.enabled else None
         for msg in msgList:
+            if stats:
+                t0 = pdstats.clock()
             # remove trailing semicolon and newline
             msg = msg[:-2]
-            Log("FCPD", f"PDServer : <<<{msg}\r\n")
+            logger.log("FCPD", "PDServer : <<<%s\r\n", msg)
 
             # split words
             words = msg.split(" ")
+            if stats:
+                t1 = pdstats.clock()
 
             if words[0] == "initrcv":
                 self.outputSocket.connectToHost(
@@ -134,9 +153,11 @@ class PureDataServer(QtCore.QObject):
                 )
                 if self.outputSocket.waitForConnected(1000):
                     self.isWaiting = False
-                    Log(
+                    logger.log(
                         "FCPD",
-                        f"PDServer : Callback initialized to {self.remoteAddress.toString()}:{words[1]}\n",
+                        "PDServer : Callback initialized to %s:%s\n",
+                        self.remoteAddress.toString(),
+                        words[1],
                     )
                     if self.writeBuffer:
                         Wrn(
@@ -144,17 +165,25 @@ class PureDataServer(QtCore.QObject):
                             "PDServer : The data previously stored are now sent\n",
                         )
                         self.outputSocket.write(bytes(self.writeBuffer, "utf8"))
-                        Log("FCPD", f"PDServer : >>> {self.writeBuffer}\r\n")
+                        logger.log("FCPD", "PDServer : >>> %s\r\n", self.writeBuffer)
                         self.writeBuffer = ""
                 else:
-                    Log(
+                    logger.log(
                         "FCPD",
-                        f"PDServer : ERROR during callback initialization\n{self.outputSocket.error()}\n",
+                        "PDServer : ERROR during callback initialization\n%s\n",
+                        self.outputSocket.error(),
                     )
             elif words[0] == "close":
                 self.terminate()
             elif len(words) > 1:
+                # callback include current patch id ($0 in PD) to route the message
+                route = words[0]
+                if words[1] == REQUEST_ID and len(words) > 3:
+                    route = f"{words[0]} {REQUEST_ID} {words[2]}"
+                    words = [words[0]] + words[3:]
+                self.route = route
                 # is words[1] registered ?
+                error = False
                 try:
                     if words[1] in self.messageHandlerList:
                         ret = self.messageHandlerList[words[1]](self, words)
@@ -164,22 +193,41 @@ class PureDataServer(QtCore.QObject):
                     if RAISE_ERROR:
                         raise e
                     ret = self.errorHandler(words)
-                # callback include current patch id ($0 in PD) to route the message
-                returnValue.append(f"{words[0]} {PDMsgTranslator.strFromValue(ret)};")
+                    error = True
+                if stats:
+                    t2 = pdstats.clock()
+                returnValue.append(f"{route} {PDMsgTranslator.strFromValue(ret)};")
+                # unregistered commands are counted together
+                command = words[1]
+                if command not in self.messageHandlerList:
+                    command = "(default)"
+                if commands is not None:
+                    commands.append(command)
+                if stats:
+                    stats.record(command, t1 - t0, t2 - t1, pdstats.clock() - t2, error)
         return returnValue
 
     ## send a message to the PureData client
     #  @param self
     #  @param data the message as a string
+    #  @param command the stats command charged with the write time,
+    #  the one the message answers or the observer or job which sends it
     #  @return Nothing
-    def send(self, *data):
+    def send(self, *data, command="(send)"):
         writeBuffer = ""
         for d in data:
             writeBuffer += f" {PDMsgTranslator.strFromValue(d)}"
         writeBuffer += ";\n"
+        if self.recorder:
+            self.recorder.recordOutbound(writeBuffer)
         if self.isAvailable() and self.outputSocket.isOpen():
-            self.outputSocket.write(bytes(writeBuffer, "utf8"))
-            Log("FCPD", f"PDServer : >>> {writeBuffer}\r\n")
+            if self.stats.enabled:
+                t0 = pdstats.clock()
+                self.outputSocket.write(bytes(writeBuffer, "utf8"))
+                self.stats.recordWrite(command, pdstats.clock() - t0)
+            else:
+                self.outputSocket.write(bytes(writeBuffer, "utf8"))
+            logger.log("FCPD", "PDServer : >>> %s\r\n", writeBuffer)
         else:
             self.writeBuffer = writeBuffer
             Wrn(
@@ -192,17 +240,51 @@ class PureDataServer(QtCore.QObject):
     #  @param self
     #  @return Nothing
     def run(self):
+        pdlog.configure()
         if self.tcpServer.listen(QHostAddress(self.listenAddress), self.listenPort):
             self.isRunning = True
             self.isWaiting = True
-            Log("FCPD", f"PDServer : Listening on port {self.listenPort}\r\n")
+            logger.log("FCPD", "PDServer : Listening on port %s\r\n", self.listenPort)
             Notif("FCPD", "The server is waiting for a PureData connection.")
         else:
             Err("FCPD", f"PDServer : unable to listen port {self.listenPort}\r\n")
 
+    ## record the inbound and outbound messages
+    #  @param self
+    #  @param path the recording file, compressed if it ends with .gz
+    #  @return Nothing
+    def startRecording(self, path):
+        self.stopRecording()
+        self.recorder = pdrecorder.SessionRecorder(path)
+        Msg("FCPD", f"PDServer : recording to {path}\n")
+
+    ## stop the recording
+    #  @param self
+    #  @return the number of recorded messages
+    def stopRecording(self):
+        if self.recorder is None:
+            return 0
+        count = self.recorder.count
+        self.recorder.close()
+        self.recorder = None
+        return count
+
+    ## feed a recording back to the message processor
+    #  @param self
+    #  @param path the recording file
+    #  @param timing "fast" or "original"
+    #  @return (replies, recorded replies, elapsed s)
+    def replay(self, path, timing="fast"):
+        return pdrecorder.replay(self, path, timing)
+
     ## Ask the server to terminate
     #  @param self
     def terminate(self):
+        # nobody will wait the results
+        if pdjobs.jobQueue is not None:
+            pdjobs.jobQueue.shutdown()
+        # a reopened patch gets new $0, its controler group is reused
+        pdcontroler.release()
         if self.outputSocket:
             self.outputSocket.write(b"0 close;")
             self.outputSocket.disconnectFromHost()
@@ -216,9 +298,11 @@ class PureDataServer(QtCore.QObject):
         self.inputSocket.aboutToClose.connect(self.remoteClose)
         self.tcpServer.close()  # no new connection accepted
         self.remoteAddress = self.inputSocket.peerAddress()
-        Log(
+        logger.log(
             "FCPD",
-            f"PDServer : Connection from {self.remoteAddress.toString()}:{self.inputSocket.peerPort()}\r\n",
+            "PDServer : Connection from %s:%s\r\n",
+            self.remoteAddress.toString(),
+            self.inputSocket.peerPort(),
         )
         Notif("FCPD", "The server is now connected.")
 
@@ -233,15 +317,18 @@ class PureDataServer(QtCore.QObject):
             if not (lastLine[-1:] == "\n" or lastLine[-1] == ";"):
                 msgList = msgList[:-1]
                 self.readBuffer = lastLine
-            retList = self._pdMsgListProcessor(msgList)
-            if retList:
-                for ret in retList:
-                    self.send(ret)
+            if self.recorder:
+                self.recorder.recordInbound(msgList)
+            commands = []
+            retList = self._pdMsgListProcessor(msgList, commands)
+            for ret, command in zip(retList, commands):
+                self.send(ret, command=command)
 
     def remoteClose(self):
-        Log(
+        logger.log(
             "FCPD",
-            f"PDServer : {self.inputSocket.peerAddress().toString()} close connection\r\n",
+            "PDServer : %s close connection\r\n",
+            self.inputSocket.peerAddress().toString(),
         )
         if self.isRunning:
             self.terminate()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  pdstats.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module records the PureDataServer dispatch counters and latencies
+
+## @package pdstats
+
+import collections
+import csv
+import json
+import time
+
+# dispatch stages, in processing order
+STAGES = ("parse", "handler", "serialize", "write")
+
+# latency histograms use power of 2 buckets in µs : <1, <2, <4 ... >=2^(BUCKETS-2)
+BUCKETS = 24
+
+# number of the last messages kept in the ring buffer
+RING_SIZE = 1024
+
+clock = time.perf_counter_ns
+
+
+def bucket(ns):
+    return min((ns // 1000).bit_length(), BUCKETS - 1)
+
+
+## counters and latency histograms of one command
+class CommandStats:
+    __slots__ = ("count", "errors", "totals", "maxima", "histograms")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.totals = [0] * len(STAGES)
+        self.maxima = [0] * len(STAGES)
+        self.histograms = [[0] * BUCKETS for _ in STAGES]
+
+    def add(self, stage, ns):
+        self.totals[stage] += ns
+        if ns > self.maxima[stage]:
+            self.maxima[stage] = ns
+        self.histograms[stage][bucket(ns)] += 1
+
+    def percentile(self, stage, ratio):
+        """upper bound in µs of the bucket reached by ratio of the samples"""
+        histogram = self.histograms[stage]
+        target = ratio * sum(histogram)
+        cumul = 0
+        for ind, cnt in enumerate(histogram):
+            cumul += cnt
+            if cnt and cumul >= target:
+                return 1 << ind
+        return 0
+
+    def summary(self):
+        ret = {"count": self.count, "errors": self.errors}
+        for ind, stage in enumerate(STAGES):
+            samples = sum(self.histograms[ind])
+            ret[stage] = {
+                "mean_us": self.totals[ind] / samples / 1000 if samples else 0,
+                "max_us": self.maxima[ind] / 1000,
+                "p95_us": self.percentile(ind, 0.95),
+                "histogram": list(self.histograms[ind]),
+            }
+        return ret
+
+
+## Dispatch statistics of a PureDataServer
+#  cheap enough to stay enabled : a few counter updates by message
+class DispatchStats:
+    PARSE, HANDLER, SERIALIZE, WRITE = range(len(STAGES))
+
+    def __init__(self, enabled=True, ringSize=RING_SIZE):
+        self.enabled = enabled
+        self.commands = collections.defaultdict(CommandStats)
+        # (timestamp_ns, command, parse_ns, handler_ns, serialize_ns)
+        self.ring = collections.deque(maxlen=ringSize)
+        self.started = clock()
+
+    def reset(self):
+        self.commands.clear()
+        self.ring.clear()
+        self.started = clock()
+
+    def record(self, command, parse, handler, serialize, error=False):
+        stats = self.commands[command]
+        stats.count += 1
+        if error:
+            stats.errors += 1
+        stats.add(self.PARSE, parse)
+        stats.add(self.HANDLER, handler)
+        stats.add(self.SERIALIZE, serialize)
+        self.ring.append((clock(), command, parse, handler, serialize))
+
+    def recordWrite(self, command, ns):
+        self.commands[command].add(self.WRITE, ns)
+
+    def summary(self):
+        """{command: {count, errors, stage: {mean_us, max_us, p95_us, histogram}}}"""
+        return {cmd: stats.summary() for cmd, stats in self.commands.items()}
+
+    def table(self):
+        """flat [command count mean_us p95_us ...] list, sorted by handler time"""
+        ret = []
+        ordered = sorted(
+            self.commands.items(),
+            key=lambda item: item[1].totals[self.HANDLER],
+            reverse=True,
+        )
+        for cmd, stats in ordered:
+            total = sum(stats.totals[: self.WRITE])
+            ret += [
+                cmd,
+                stats.count,
+                round(total / stats.count / 1000, 1) if stats.count else 0,
+                stats.percentile(self.HANDLER, 0.95),
+            ]
+        return ret
+
+    def dump(self, path):
+        """write the statistics to path, as CSV if path ends with .csv else as JSON"""
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(
+                    ["command", "count", "errors"]
+                    + [
+                        f"{s}_{k}"
+                        for s in STAGES
+                        for k in ("mean_us", "max_us", "p95_us")
+                    ]
+                )
+                for cmd, summary in self.summary().items():
+                    writer.writerow(
+                        [cmd, summary["count"], summary["errors"]]
+                        + [
+                            summary[s][k]
+                            for s in STAGES
+                            for k in ("mean_us", "max_us", "p95_us")
+                        ]
+                    )
+        else:
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "uptime_s": (clock() - self.started) / 1e9,
+                        "commands": self.summary(),
+                        "last": list(self.ring),
+                    },
+                    f,
+                    indent=1,
+                )
+        return path
+
+    def __str__(self):
+        lines = [
+            f"{'command':>20} {'count':>8} {'errors':>6} "
+            + " ".join(f"{s + ' µs':>12}" for s in STAGES)
+        ]
+        for cmd, summary in self.summary().items():
+            lines.append(
+                f"{cmd:>20} {summary['count']:>8} {summary['errors']:>6} "
+                + " ".join(f"{summary[s]['mean_us']:>12.1f}" for s in STAGES)
+            )
+        return "\n".join(lines)
@@ -25,18 +25,26 @@
 
 # this module translate pd message to action
 
+import time
+
+from PySide import QtCore
+
 import FreeCAD as App
 
-from . import pdmsgtranslator
+from . import pdcache, pdjobs, pdmsgtranslator
 
 PDMsgTranslator = pdmsgtranslator.PDMsgTranslator
 
 # shortcuts of FreeCAD console
-Log = App.Console.PrintLog
 Msg = App.Console.PrintMessage
 Wrn = App.Console.PrintWarning
 Err = App.Console.PrintError
 
+userPref = App.ParamGet("User parameter:BaseApp/Preferences/Mod/FCPD")
+
+# default minimum delay between two observer updates in ms
+OBSERVER_INTERVAL = 50
+
 
 def registerToolList(pdServer):
     toolList = [
@@ -52,11 +60,14 @@ def registerToolList(pdServer):
         ("link", pdLink),
         ("bylabel", pdByLabel),
         ("Object", pdObject),
+        ("Objects", pdObjects),
         ("onMove", pdOnMove),
-        ("matrixPlacement", pdMatrixPlacement),
         ("Part", pdPart),
         ("Shape", pdShape),
         ("Draft", pdDraft),
+        ("stats", pdStats),
+        ("record", pdRecord),
+        ("job", pdJob),
     ]
 
     for word, func in toolList:
@@ -68,6 +79,43 @@ def pdElse(words):
     return "ERROR unknown command."
 
 
+def pdStats(pdServer, words):
+    """stats [reset | on | off | dump path] --> [command count mean_us p95_us ...]
+    stats cache [reset | clear | size MB] --> [hits count misses count ...]"""
+    stats = pdServer.stats
+    if len(words) > 2:
+        if words[2] == "cache":
+            return pdCacheStats(words[3:])
+        elif words[2] == "reset":
+            stats.reset()
+        elif words[2] in ("on", "off"):
+            stats.enabled = words[2] == "on"
+        elif words[2] == "dump":
+            return stats.dump(" ".join(words[3:]).strip('"'))
+    return stats.table()
+
+
+def pdCacheStats(words):
+    cache = pdcache.cache
+    if words:
+        if words[0] == "reset":
+            cache.reset()
+        elif words[0] == "clear":
+            cache.clear()
+        elif words[0] == "size":
+            cache.setBudget(int(float(words[1]) * pdcache.MB))
+    return cache.table()
+
+
+def pdRecord(pdServer, words):
+    """record start path | record stop --> recorded messages count"""
+    if words[2] == "start":
+        pdServer.startRecording(" ".join(words[3:]).strip('"'))
+        return 0
+    elif words[2] == "stop":
+        return pdServer.stopRecording()
+
+
 def pdGet(pdServer, words):
     if words[2] == "selection":
         sel = App.Gui.Selection.getSelection()
@@ -76,6 +124,15 @@ def pdGet(pdServer, words):
     elif words[2] == "property":
         obj = PDMsgTranslator.valueFromStr(words[3])[0].value
         return getattr(obj, words[4])
+    elif words[2] == "properties":
+        # get properties Object Property1 Property2 ... --> [Values]
+        obj = PDMsgTranslator.valueFromStr(words[3])[0].value
+        return [getattr(obj, propName) for propName in words[4:]]
+    elif words[2] == "property-of":
+        # get property-of Property Object1 Object2 ... --> [Values]
+        propName = words[3]
+        _, objects = PDMsgTranslator.popValues(words[4:])
+        return [getattr(obj.value, propName) for obj in objects]
     elif words[2] == "constraint":
         skc = PDMsgTranslator.valueFromStr(words[3])[0].value
         return skc.getDatum(words[4])
@@ -156,54 +213,125 @@ def pdRecompute(pdServer, words):
     App.ActiveDocument.recompute()
 
 
+class ThrottledObserver:
+    """Base of the observers sending to PD at most once by interval
+    the state is read when the update is really sent, so the last one wins"""
+
+    def __init__(self, pdServer, uid, interval=None):
+        self.pdServer = pdServer
+        self.uid = uid
+        if interval is None:
+            interval = userPref.GetInt("observer_interval", OBSERVER_INTERVAL)
+        self.interval = interval
+        self.lastSent = 0.0
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def schedule(self):
+        if self.timer.isActive():
+            # an update is already pending
+            return
+        wait = self.interval - (time.monotonic() - self.lastSent) * 1000
+        if wait <= 0:
+            self.flush()
+        else:
+            self.timer.start(int(wait))
+
+    def flush(self):
+        self.lastSent = time.monotonic()
+        self.sendState()
+
+    def sendState(self):
+        """to be overwritten, send the current state to PD"""
+        pass
+
+    def stop(self):
+        self.timer.stop()
+
+
+def observerOptions(words):
+    """parse [delta] [interval] observer arguments"""
+    delta = "delta" in words
+    interval = None
+    for w in words:
+        try:
+            interval = int(w)
+        except ValueError:
+            pass
+    return delta, interval
+
+
 def pdSelObserver(pdServer, words):
-    """selobserver --> "OK" at creation
-    --> list of selected objects when selection changes"""
+    """selobserver [delta] [interval] --> "OK" at creation
+    --> list of selected objects when selection changes
+    or list of +AddedObject -RemovedObject if delta is set
+    updates are sent at most once by interval ms"""
 
     # See https://wiki.freecadweb.org/Code_snippets#Function_resident_with_the_mouse_click_action
-    class SelObserver:
-        def __init__(self, pdServer, uid):
-            self.pdServer = pdServer
-            self.uid = uid
+    class SelObserver(ThrottledObserver):
+        def __init__(self, pdServer, uid, delta, interval):
+            super().__init__(pdServer, uid, interval)
+            self.delta = delta
+            self.lastSelection = []
 
-        def send(self):
+        def sendState(self):
             sel = App.Gui.Selection.getSelection()
             objList = [obj.Name for obj in sel]
-            self.pdServer.send(self.uid, objList)
+            if objList == self.lastSelection:
+                return
+            if self.delta:
+                current = set(objList)
+                previous = set(self.lastSelection)
+                changes = [f"-{n}" for n in self.lastSelection if n not in current]
+                changes += [f"+{n}" for n in objList if n not in previous]
+                self.pdServer.send(self.uid, changes, command="selobserver")
+            else:
+                self.pdServer.send(self.uid, objList, command="selobserver")
+            self.lastSelection = objList
 
         def addSelection(self, doc, obj, sub, pnt):
-            self.send()
+            self.schedule()
 
         def removeSelection(self, doc, obj, sub):
-            self.send()
+            self.schedule()
 
         def setSelection(self, doc):
-            self.send()
+            self.schedule()
 
         def clearSelection(self, doc):
-            self.send()
+            self.schedule()
 
-    s = SelObserver(pdServer, words[0])
+    s = SelObserver(pdServer, words[0], *observerOptions(words[2:]))
     pdServer.observersStore[words[0]] = s  # store the observer to allow removing later
     App.Gui.Selection.addObserver(s)
     return "OK"
 
 
 def pdObjObserver(pdServer, words):
-    """objobserver ObjectName   --> "OK" at creation
-    --> bang when mouse enter the object"""
+    """objobserver ObjectName [interval] --> "OK" at creation
+    --> bang when mouse enter the object
+    bangs are sent at most once by interval ms"""
 
-    class PreSelObserver:
-        def __init__(self, pdServer, uid, obj):
-            self.pdServer = pdServer
-            self.uid = uid
+    class PreSelObserver(ThrottledObserver):
+        def __init__(self, pdServer, uid, obj, interval):
+            super().__init__(pdServer, uid, interval)
             self.obj = obj
+            self.pending = False
+
+        def sendState(self):
+            if self.pending:
+                self.pending = False
+                self.pdServer.send(self.uid, "bang", command="objobserver")
 
         def setPreselection(self, doc, obj, sub):
             if obj == self.obj:
-                self.pdServer.send(f"{self.uid} bang;")
+                self.pending = True
+                self.schedule()
 
-    s = PreSelObserver(pdServer, words[0], words[2])
+    _, interval = observerOptions(words[3:])
+    s = PreSelObserver(pdServer, words[0], words[2], interval)
     pdServer.observersStore[words[0]] = s  # store the observer to allow removing later
     App.Gui.Selection.addObserver(s)
     return "OK"
@@ -211,12 +339,17 @@ def pdObjObserver(pdServer, words):
 
 def pdRemObserver(pdServer, words):
     """remobserver --> "OK" """
+    if getDocObserverRegistry(pdServer).remove(words[0]):
+        return "OK"
     # Uninstall the resident function
     try:
-        App.Gui.Selection.removeObserver(pdServer.observersStore[words[0]])
-        App.removeDocumentObserver(pdServer.observersStore[words[0]])
+        observer = pdServer.observersStore[words[0]]
+        App.Gui.Selection.removeObserver(observer)
+        App.removeDocumentObserver(observer)
     except KeyError:
         return
+    if isinstance(observer, ThrottledObserver):
+        observer.stop()
     del pdServer.observersStore[words[0]]
     return "OK"
 
@@ -238,13 +371,12 @@ def pdByLabel(pdServer, words):
     return lst
 
 
-def pdObject(pdServer, words):
-    """Object Module Type [Property1 Value1 Property2 Value2 ...]  --> NewObjectName"""
-    doc = App.ActiveDocument
-    objMod = words[2]
-    objType = words[3]
+def addObject(doc, words):
+    """create an object from [Module Type Property1 Value1 Property2 Value2 ...]"""
+    objMod = words[0]
+    objType = words[1]
     obj = doc.addObject(f"{objMod}::{objType}", objType)
-    current = 4
+    current = 2
     while current < len(words):
         propName = words[current]
         prop, used = PDMsgTranslator.valueFromStr(words[current + 1 :])
@@ -254,23 +386,104 @@ def pdObject(pdServer, words):
     return obj
 
 
-def pdOnMove(pdServer, words):
-    """onMove ObjectName    --> "OK" at creation
-    --> placement when the object move"""
+def pdObject(pdServer, words):
+    """Object Module Type [Property1 Value1 Property2 Value2 ...]  --> NewObjectName"""
+    return addObject(App.ActiveDocument, words[2:])
 
-    class DocObserver:
-        def __init__(self, pdServer, uid, obj):
-            self.pdServer = pdServer
-            self.uid = uid
-            self.obj = obj
 
-        def slotChangedObject(self, obj, prop):
-            if obj.Label == self.obj and prop == "Placement":
-                self.pdServer.send(self.uid, obj.Placement)
+def pdObjects(pdServer, words):
+    """Objects Module Type [Property1 Value1 ...] | Module Type [...] | ...
+    --> [NewObjectNames]
+    all objects are created in one undo transaction with recompute suspended"""
+    doc = App.ActiveDocument
+    specs = []
+    start = 2
+    for i, w in enumerate(words[2:], 2):
+        if w == "|":
+            specs.append(words[start:i])
+            start = i + 1
+    specs.append(words[start:])
+
+    frozen = doc.RecomputesFrozen
+    doc.openTransaction("FCPD Objects")
+    doc.RecomputesFrozen = True
+    try:
+        names = [addObject(doc, spec).Name for spec in specs if spec]
+    except Exception:
+        doc.abortTransaction()
+        raise
+    finally:
+        doc.RecomputesFrozen = frozen
+    doc.commitTransaction()
+    return names
+
+
+class DocObserverRegistry:
+    """One document observer shared by all the property watchers
+    changes are dispatched through a dict keyed by (object FullName, property)"""
+
+    def __init__(self, pdServer):
+        self.pdServer = pdServer
+        self.watchers = {}  # (FullName, property) -> {uid: None}
+        self.keys = {}  # uid -> (FullName, property)
+        self.installed = False
+
+    def add(self, uid, obj, prop):
+        self.remove(uid)
+        key = (obj.FullName, prop)
+        self.watchers.setdefault(key, {})[uid] = None
+        self.keys[uid] = key
+        if not self.installed:
+            App.addDocumentObserver(self)
+            self.installed = True
+
+    def remove(self, uid):
+        """remove the watcher of uid, return False if there is none"""
+        key = self.keys.pop(uid, None)
+        if key is None:
+            return False
+        uids = self.watchers[key]
+        del uids[uid]
+        if not uids:
+            del self.watchers[key]
+        if not self.keys and self.installed:
+            App.removeDocumentObserver(self)
+            self.installed = False
+        return True
 
-    s = DocObserver(pdServer, words[0], words[2])
-    pdServer.observersStore[words[0]] = s  # store the observer to allow removing later
-    App.addDocumentObserver(s)
+    def slotChangedObject(self, obj, prop):
+        uids = self.watchers.get((obj.FullName, prop))
+        if uids:
+            value = getattr(obj, prop)
+            for uid in uids:
+                self.pdServer.send(uid, value, command="onMove")
+
+
+docObserverRegistry = None
+
+
+def getDocObserverRegistry(pdServer):
+    global docObserverRegistry
+    if docObserverRegistry is None:
+        docObserverRegistry = DocObserverRegistry(pdServer)
+    return docObserverRegistry
+
+
+def pdOnMove(pdServer, words):
+    """onMove Object [Property]    --> "OK" at creation
+    --> property value (Placement by default) when it changes"""
+    obj = PDMsgTranslator.valueFromStr(words[2])[0].value
+    if not hasattr(obj, "FullName"):
+        # not an object name, look for a label
+        objects = App.ActiveDocument.getObjectsByLabel(words[2])
+        if not objects:
+            return f"ERROR unknown object {words[2]}"
+        obj = objects[0]
+    prop = words[3] if len(words) > 3 else "Placement"
+    if not hasattr(obj, prop):
+        return f"ERROR {obj.Name} has no property {prop}"
+
+    getDocObserverRegistry(pdServer).add(words[0], obj, prop)
     return "OK"
 
 
@@ -298,52 +511,107 @@ def getParametersCount(func):
     return len(params)
 
 
-def pdMatrixPlacement(pdServer, words):
-    val, _ = PDMsgTranslator.valueFromStr(words[2:])
-    val = val.value
-    if hasattr(val, "flatten"):
-        # numpy array case
-        return App.Placement(App.Matrix(*val.flatten()))
-    else:
-        return App.Placement(App.Matrix(*val))
-
-
 ###################################################
 # PART WORKBENCH                                  #
 def pdPart(pdServer, words):
+    """Part [async] function args... --> result
+    with async --> job id, then "job id result" when done"""
     import Part
 
+    isAsync = words[2] == "async"
+    if isAsync:
+        words = words[:2] + words[3:]
     func_name = words[2]
     if hasattr(Part, func_name):
         func = getattr(Part, func_name)
         pcount = getParametersCount(func)
         _, values = PDMsgTranslator.popValues(words[3:], pcount, ignoreNotSet=True)
         args = [val.value for val in values]
+        name = f"Part.{func_name}"
+        cacheKey = None
+        if func_name in pdcache.CACHED_FUNCTIONS:
+            cacheKey = pdcache.cache.key(name, *args)
+        result = None if cacheKey is None else pdcache.cache.get(cacheKey)
+        if isAsync:
+            if func_name not in pdjobs.PART_FUNCTIONS:
+                return f"ERROR Part.{func_name} is not allowed in a job"
+            jobs = pdjobs.getJobQueue(pdServer)
+            if result is not None:
+                return jobs.submitResult(pdServer.route, name, result)
+            return jobs.submitFunction(
+                pdServer.route, func_name, args, cacheKey=cacheKey
+            )
+        if result is not None:
+            return result
         if words[2].startswith("make_"):
             shape = func(*args)
             Part.show(shape)
             return App.ActiveDocument.ActiveObject.Name
         else:
-            return func(*args)
+            result = func(*args)
+            pdcache.cache.put(cacheKey, result)
+            return result
     else:
         return f"ERROR unknown function Part.{func_name}"
 
 
 def pdShape(pdServer, words):
+    """Shape [async] method shape args... --> result
+    with async --> job id, then "job id result" when done"""
     import Part
 
+    isAsync = words[2] == "async"
+    if isAsync:
+        words = words[:2] + words[3:]
     func_name = words[2]
     if hasattr(Part.Shape, func_name):
         theShape = PDMsgTranslator.valueFromStr(words[3])[0].value
+        if isAsync:
+            if func_name not in pdjobs.SHAPE_METHODS:
+                return f"ERROR Part.Shape.{func_name} is not allowed in a job"
         func = theShape.__getattribute__(func_name)
         pcount = getParametersCount(func)
         _, values = PDMsgTranslator.popValues(words[4:], pcount, ignoreNotSet=True)
         args = [val.value for val in values]
-        return func(*args)
+        name = f"Shape.{func_name}"
+        cacheKey = None
+        if func_name in pdcache.CACHED_METHODS:
+            cacheKey = pdcache.cache.key(name, theShape, *args)
+        result = None if cacheKey is None else pdcache.cache.get(cacheKey)
+        if isAsync:
+            jobs = pdjobs.getJobQueue(pdServer)
+            if result is not None:
+                return jobs.submitResult(pdServer.route, name, result)
+            return jobs.submitShape(
+                pdServer.route, func_name, theShape, args, cacheKey=cacheKey
+            )
+        if result is not None:
+            return result
+        result = func(*args)
+        pdcache.cache.put(cacheKey, result)
+        return result
     else:
         return f"ERROR unknown function Part.Shape.{func_name}"
 
 
+def pdJob(pdServer, words):
+    """job cancel id | job status id --> "OK" | state
+    job list --> ids of the pending and running jobs"""
+    jobs = pdjobs.getJobQueue(pdServer)
+    if words[2] == "list":
+        return list(jobs.jobs)
+    jobId = int(words[3])
+    if words[2] == "cancel":
+        if jobs.cancel(jobId):
+            return "OK"
+        if jobs.status(jobId) == pdjobs.DONE:
+            return f"ERROR job {jobId} is done"
+        return f"ERROR unknown job {jobId}"
+    elif words[2] == "status":
+        return jobs.status(jobId) or f"ERROR unknown job {jobId}"
+    return f"ERROR unknown job command {words[2]}"
+
+
 #                                  PART WORKBENCH #
 ###################################################
 
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+###################################################################################
+#
+#  fcpdwb_offload.py
+#
+#  Copyright 2025 Florian Foinant-Willig <ffw@2f2v.fr>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+#
+###################################################################################
+
+# this module is the worker side of the geometry process pool (see fcpd.pdjobs)
+#  it is imported by headless worker processes, so it stays out of the fcpd
+#  package which needs the GUI, and imports FreeCAD only in the workers
+#  shapes travel between processes as BREP strings, the sub-shapes of the
+#  target shape of a method as their element name, as "Edge3", since a BREP
+#  of its own would not be a sub-shape of the decoded target
+
+import sys
+import time
+
+# tag of an encoded shape
+BREP = "__brep__"
+# tag of a sub-shape of the target shape
+ELEMENT = "__element__"
+
+
+## initializer of the worker processes, import FreeCAD and Part once
+def initWorker(paths):
+    for path in paths:
+        if path not in sys.path:
+            sys.path.append(path)
+    import FreeCAD  # noqa: F401
+    import Part  # noqa: F401
+
+
+def ping():
+    """warm up call, returns once the worker imports are done"""
+    return True
+
+
+def encode(value):
+    """replace the shapes of a value by their BREP"""
+    import Part
+
+    if isinstance(value, Part.Shape):
+        return (BREP, value.exportBrepToString())
+    if isinstance(value, list):
+        return [encode(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(encode(v) for v in value)
+    return value
+
+
+def element(name):
+    """encode a sub-shape of the target shape by its name"""
+    return (ELEMENT, name)
+
+
+def decode(value, shape=None):
+    """rebuild the shapes of an encoded value
+    the elements are taken from shape, the decoded target shape"""
+    import Part
+
+    if isinstance(value, tuple) and len(value) == 2 and value[0] == BREP:
+        shape = Part.Shape()
+        shape.importBrepFromString(value[1])
+        return shape
+    if isinstance(value, tuple) and len(value) == 2 and value[0] == ELEMENT:
+        return shape.getElement(value[1])
+    if isinstance(value, list):
+        return [decode(v, shape) for v in value]
+    if isinstance(value, tuple):
+        return tuple(decode(v, shape) for v in value)
+    return value
+
+
+def runShapeMethod(method, shape, args):
+    """run Part.Shape.method on decoded values
+    return the encoded result and the compute time in ns"""
+    shape = decode(shape)
+    args = decode(args, shape)
+    start = time.perf_counter_ns()
+    result = getattr(shape, method)(*args)
+    return encode(result), time.perf_counter_ns() - start
+
+
+def runPartFunction(function, args):
+    """run Part.function on decoded values
+    return the encoded result and the compute time in ns"""
+    import Part
+
+    args = decode(args)
+    start = time.perf_counter_ns()
+    result = getattr(Part, function)(*args)
+    return encode(result), time.perf_counter_ns() - start
@@ -53,5 +53,95 @@
         <source>Port de retour</source>
         <translation>Callback port</translation>
     </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="134"/>
+        <source>Intervalle des observateurs (ms)</source>
+        <translation>Observers interval (ms)</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="141"/>
+        <source>Délai minimum entre deux envois de la sélection à Pure-Data</source>
+        <translation>Minimum delay between two selection updates sent to Pure-Data</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="163"/>
+        <source>Journal du serveur</source>
+        <translation>Server log</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="170"/>
+        <source>Messages échangés avec Pure-Data</source>
+        <translation>Messages exchanged with Pure-Data</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="183"/>
+        <source>Erreur</source>
+        <translation>Error</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="188"/>
+        <source>Avertissement</source>
+        <translation>Warning</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="193"/>
+        <source>Message</source>
+        <translation>Message</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="198"/>
+        <source>Journal</source>
+        <translation>Log</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="206"/>
+        <source>Journal du traducteur</source>
+        <translation>Translator log</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="213"/>
+        <source>Conversion des messages en valeurs FreeCAD</source>
+        <translation>Conversion of the messages into FreeCAD values</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="249"/>
+        <source>Journal des outils</source>
+        <translation>Tools log</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="256"/>
+        <source>Commandes, contrôleurs et objets bruts</source>
+        <translation>Commands, controlers and raw objects</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="292"/>
+        <source>Journal des inclusions</source>
+        <translation>Includes log</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="299"/>
+        <source>Patchs Pure-Data inclus dans les documents</source>
+        <translation>Pure-Data patches included in the documents</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="335"/>
+        <source>Fichier journal</source>
+        <translation>Log file</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="342"/>
+        <source>Si renseigné le journal est écrit dans ce fichier (JSON, un message par ligne) au lieu de la console FreeCAD</source>
+        <translation>If set the log is written to this file (JSON, one message per line) instead of the FreeCAD console</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="355"/>
+        <source>Taille du fichier journal (ko)</source>
+        <translation>Log file size (kB)</translation>
+    </message>
+    <message>
+        <location filename="../FCPDwb_pref.ui" line="362"/>
+        <source>Taille au-delà de laquelle le fichier journal est archivé</source>
+        <translation>Size beyond which the log file is archived</translation>
+    </message>
 </context>
 </TS>